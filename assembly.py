@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import json
+import re
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from .models import BRDModel, GapReport, IntakeSummary
+
+# "local" assembles without the model, "normalize" adds a small terminology pass, "llm" is the original prompt.
+ASSEMBLER_MODES = ("local", "normalize", "llm")
+
+_CITATIONS_HEADING = re.compile(r"^\s*(?:#{1,6}\s*)?(?:\*\*|__)?citations\s*:?\s*(?:\*\*|__)?\s*:?\s*$", re.IGNORECASE)
+_HEADING = re.compile(r"^\s*#{1,6}\s+\S")
+_LIST_MARKER = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+")
+_TERM_CANDIDATE = re.compile(r"\b(?:[A-Z]{2,}[a-z]*s?|[A-Z][a-z]+(?:[ -][A-Z][a-z]+)+)\b")
+
+
+def split_citations(draft: str) -> Tuple[str, List[str]]:
+    body: List[str] = []
+    citations: List[str] = []
+    in_citations = False
+    for line in draft.splitlines():
+        if _CITATIONS_HEADING.match(line):
+            in_citations = True
+            continue
+        if in_citations and _HEADING.match(line):
+            in_citations = False
+        if not in_citations:
+            body.append(line)
+        elif line.strip():
+            citations.append(_LIST_MARKER.sub("", line).strip().strip("()"))
+    return "\n".join(body).strip(), citations
+
+
+def _citation_key(citation: str) -> str:
+    return re.sub(r"\s+", " ", citation.strip().strip("()[]`*").replace("|", ",")).lower()
+
+
+def _question_key(question: str) -> str:
+    return re.sub(r"\s+", " ", question).strip().rstrip("?.").lower()
+
+
+def _with_heading(section_name: str, body: str) -> str:
+    if body.lstrip().startswith("#"):
+        return body
+    return f"## {section_name}\n\n{body}"
+
+
+def open_questions(gaps: GapReport, intake: Optional[IntakeSummary]) -> List[str]:
+    questions = [f"{g.section} — {g.field}: {g.suggested_evidence_to_provide} (blocking)" for g in gaps.blocking]
+    questions += [f"{g.section} — {g.field}: {g.suggested_evidence_to_provide}" for g in gaps.non_blocking]
+    if intake is not None:
+        questions += intake.open_questions
+    seen = set()
+    unique = []
+    for question in questions:
+        key = _question_key(question)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(question.strip())
+    return unique
+
+
+def assemble_brd(
+    section_names: Sequence[str],
+    drafts: Sequence[str],
+    gaps: GapReport,
+    intake: Optional[IntakeSummary],
+    terminology: Optional[Mapping[str, str]] = None,
+) -> Tuple[BRDModel, str]:
+    sections: List[str] = []
+    # Citations are deduplicated across the document and listed once with the sections that cite them.
+    cited_by: Dict[str, Tuple[str, List[str]]] = {}
+    for name, draft in zip(section_names, drafts):
+        body, citations = split_citations(draft)
+        if not body:
+            continue
+        if terminology:
+            body = apply_terminology(body, terminology)
+        sections.append(_with_heading(name, body))
+        for citation in citations:
+            key = _citation_key(citation)
+            if not key:
+                continue
+            text, names = cited_by.setdefault(key, (citation, []))
+            if name not in names:
+                names.append(name)
+
+    questions = open_questions(gaps, intake)
+    if terminology:
+        questions = [apply_terminology(q, terminology) for q in questions]
+    title = "Business Requirements Document"
+    if intake is not None and intake.project_name:
+        title = f"{intake.project_name} — {title}"
+
+    parts = [f"# {title}", *sections]
+    if questions:
+        parts.append("## Open Questions\n\n" + "\n".join(f"- {q}" for q in questions))
+    if cited_by:
+        lines = [f"- {text} ({', '.join(names)})" for text, names in cited_by.values()]
+        parts.append("## Citations\n\n" + "\n".join(lines))
+    return BRDModel(sections=sections, open_questions=questions), "\n\n".join(parts) + "\n"
+
+
+def terminology_candidates(markdown: str, limit: int = 80) -> List[str]:
+    counts: Dict[str, int] = {}
+    for match in _TERM_CANDIDATE.finditer(markdown):
+        counts[match.group(0)] = counts.get(match.group(0), 0) + 1
+    return sorted(counts, key=lambda term: (-counts[term], term))[:limit]
+
+
+def terminology_prompt(terms: Sequence[str]) -> str:
+    return f"""SYSTEM
+You normalize terminology in a business requirements document.
+
+USER
+Task:
+- The TERMS below were extracted from one BRD.
+- Find terms that are variants of the same concept (spelling, casing, plural, acronym vs expansion).
+- Map each variant to the single canonical term that should be used throughout.
+- Omit terms that have no variant. Do not invent new terms.
+
+Output:
+Return a JSON object mapping variant -> canonical term.
+
+TERMS:
+{json.dumps(list(terms), indent=2)}
+"""
+
+
+def apply_terminology(text: str, mapping: Mapping[str, str]) -> str:
+    replacements = {v: c for v, c in mapping.items() if v and c and v != c}
+    if not replacements:
+        return text
+    # One pass, longest variants first, so "Data Lake Store" wins over "Data Lake" and nothing is rewritten twice.
+    pattern = "|".join(re.escape(v) for v in sorted(replacements, key=len, reverse=True))
+    return re.sub(rf"(?<![\w-])(?:{pattern})(?![\w-])", lambda m: replacements[m.group(0)], text)
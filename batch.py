@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import re
+import time
+from pathlib import Path
+import sys
+from typing import Any, Dict, List, Set, Tuple
+
+from dotenv import load_dotenv
+
+# Support running this file directly: `python brd_agent_2\batch.py`
+if __package__ is None or __package__ == "":
+    _pkg_dir = Path(__file__).resolve().parent
+    _parent = str(_pkg_dir.parent)
+    _pkg_dir_str = str(_pkg_dir)
+    if _pkg_dir_str in sys.path:
+        sys.path.remove(_pkg_dir_str)
+    if _parent not in sys.path:
+        sys.path.insert(0, _parent)
+
+from brd_agent_2.brd_agent_2 import (
+    add_policy_arguments,
+    add_runtime_arguments,
+    configure_runtime,
+    resume_point,
+    state_from_args,
+)
+from brd_agent_2.budget import TokenBudgetExceededError
+from brd_agent_2.checkpoints import checkpoint_store
+from brd_agent_2.config import Settings
+from brd_agent_2.graph import END, build_graph
+from brd_agent_2.llm_utils import aclose_async_client, response_cache_stats, track_usage
+from brd_agent_2.metrics import record_run
+from brd_agent_2.models import BRDState
+
+
+def parse_args() -> argparse.Namespace:
+    settings = Settings()
+    parser = argparse.ArgumentParser(description="Batch BRD generation from a JSONL manifest")
+    parser.add_argument(
+        "--manifest",
+        required=True,
+        help="JSONL file; one job per line with job_id, template, inputs, brownfield_inputs, output",
+    )
+    parser.add_argument(
+        "--results",
+        default=None,
+        help="JSONL file receiving one result per job (default: <manifest>.results.jsonl)",
+    )
+    parser.add_argument(
+        "--max-jobs",
+        type=int,
+        default=settings.default_batch_max_jobs,
+        help="Number of BRD jobs run concurrently",
+    )
+    parser.add_argument(
+        "--rerun-all",
+        action="store_true",
+        help="Run every job even if the results file records it as finished",
+    )
+    add_runtime_arguments(parser, settings)
+    add_policy_arguments(parser, gap_default="force-generate", review_default="auto-approve")
+    return parser.parse_args()
+
+
+def load_manifest(path: Path) -> List[Dict[str, Any]]:
+    jobs = []
+    for line_no, line in enumerate(path.read_text(encoding="utf-8").splitlines(), start=1):
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        if not job.get("inputs") or not job.get("output"):
+            raise ValueError(f"{path}:{line_no}: each job needs 'inputs' and 'output'")
+        job.setdefault("job_id", job["output"])
+        jobs.append(job)
+    return jobs
+
+
+def finished_job_ids(results_path: Path) -> Set[str]:
+    status: Dict[str, str] = {}
+    if results_path.exists():
+        for line in results_path.read_text(encoding="utf-8").splitlines():
+            if line.strip():
+                record = json.loads(line)
+                status[record["job_id"]] = record["status"]
+    return {job_id for job_id, value in status.items() if value == "ok"}
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", value).strip("_") or "job"
+
+
+def _job_state(job: Dict[str, Any], args: argparse.Namespace) -> BRDState:
+    return state_from_args(
+        args,
+        job["output"],
+        overrides=job,
+        template_path=job.get("template", Settings().default_template_path),
+        inputs=list(job["inputs"]),
+        brownfield_inputs=list(job.get("brownfield_inputs", [])),
+        run_id=job["job_id"],
+    )
+
+
+async def _job_start(job: Dict[str, Any], args: argparse.Namespace) -> Tuple[BRDState, str]:
+    # With --checkpoint-db, a job interrupted in an earlier batch continues from its last completed node.
+    store = checkpoint_store()
+    if store is not None and not args.rerun_all and store.latest(job["job_id"]) is not None:
+        point = await asyncio.to_thread(resume_point, job["job_id"])
+        # A job stopped at gap review starts over, picking up any inputs added to the manifest since.
+        if point is not None and not point[0].stop_reason:
+            # As with --resume, the current manifest/CLI budget replaces the saved (possibly exhausted) one.
+            token_budget = job.get("token_budget", args.token_budget)
+            if token_budget is not None:
+                point[0].token_budget = token_budget
+            return point
+    return _job_state(job, args), "load_sources"
+
+
+async def _run_job(
+    graphs: Dict[str, Any],
+    job: Dict[str, Any],
+    args: argparse.Namespace,
+    limit: asyncio.Semaphore,
+) -> Dict[str, Any]:
+    async with limit:
+        print(f"[batch] start {job['job_id']}")
+        record: Dict[str, Any] = {"job_id": job["job_id"], "output": job["output"]}
+        started = time.perf_counter()
+        # Each job runs in its own task, so the usage tracker only sees that job's LLM calls.
+        with track_usage() as usage, record_run() as run:
+            try:
+                Path(job["output"]).parent.mkdir(parents=True, exist_ok=True)
+                state, entry = await _job_start(job, args)
+                if entry != END:
+                    if entry not in graphs:
+                        graphs[entry] = build_graph(use_async=True, entry=entry).compile()
+                    final = await graphs[entry].ainvoke(state)
+                    if final.get("stop_reason"):
+                        # Stopped at gap review: not finished, so a later batch with more inputs runs it again.
+                        record["stop_reason"] = final["stop_reason"]
+                record["status"] = "stopped" if "stop_reason" in record else "ok"
+            except TokenBudgetExceededError as exc:
+                # Checkpointed up to the stop, so a later batch with a larger budget continues from there.
+                record["status"] = "stopped"
+                record["stop_reason"] = str(exc)
+            except Exception as exc:
+                record["status"] = "failed"
+                record["error"] = f"{type(exc).__name__}: {exc}"
+        record["latency_seconds"] = round(time.perf_counter() - started, 3)
+        record["usage"] = usage.as_dict()
+        record["metrics"] = {"totals": run.totals(), "nodes": run.as_dict()["nodes"]}
+        for path in args.metrics_report:
+            # One report per job: <stem>.<job_id><suffix>.
+            target = Path(path)
+            run.write_report(str(target.with_name(f"{target.stem}.{_safe_name(job['job_id'])}{target.suffix}")))
+        print(
+            f"[batch] {record['status']} {job['job_id']} latency={record['latency_seconds']}s "
+            f"tokens_used={usage.total_tokens} llm_calls={usage.calls}"
+        )
+        return record
+
+
+async def run_batch(
+    jobs: List[Dict[str, Any]],
+    results_path: Path,
+    args: argparse.Namespace,
+) -> List[Dict[str, Any]]:
+    # Compiled once per entry node; fresh jobs all share the "load_sources" graph.
+    graphs: Dict[str, Any] = {"load_sources": build_graph(use_async=True).compile()}
+    limit = asyncio.Semaphore(max(1, args.max_jobs))
+    records = []
+    try:
+        with results_path.open("a", encoding="utf-8") as results:
+            for next_done in asyncio.as_completed([_run_job(graphs, job, args, limit) for job in jobs]):
+                record = await next_done
+                # Written as each job finishes so an interrupted batch can resume from here.
+                results.write(json.dumps(record) + "\n")
+                results.flush()
+                records.append(record)
+    finally:
+        await aclose_async_client()
+    return records
+
+
+def main() -> None:
+    load_dotenv()
+    args = parse_args()
+    configure_runtime(args)
+
+    manifest = Path(args.manifest)
+    results_path = Path(args.results) if args.results else manifest.with_suffix(".results.jsonl")
+    jobs = load_manifest(manifest)
+    done = set() if args.rerun_all else finished_job_ids(results_path)
+    pending = [job for job in jobs if job["job_id"] not in done]
+    print(
+        f"[batch] {len(jobs)} job(s) in manifest; {len(jobs) - len(pending)} already finished; "
+        f"running {len(pending)}"
+    )
+
+    started = time.perf_counter()
+    records = asyncio.run(run_batch(pending, results_path, args))
+    failed = [r["job_id"] for r in records if r["status"] == "failed"]
+    stopped = [r["job_id"] for r in records if r["status"] == "stopped"]
+    total_tokens = sum(r["usage"]["total_tokens"] for r in records)
+    print(
+        f"[batch] finished {len(records) - len(failed) - len(stopped)}/{len(records)} job(s) in "
+        f"{time.perf_counter() - started:.1f}s tokens_used={total_tokens}"
+    )
+    if failed:
+        print(f"[batch] failed: {', '.join(failed)} (re-run the same command to retry them)")
+    if stopped:
+        print(f"[batch] stopped: {', '.join(stopped)} (see stop_reason in the results file)")
+    if response_cache_stats():
+        print(f"[llm_cache] {response_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
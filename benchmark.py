@@ -0,0 +1,664 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import random
+import re
+import resource
+import statistics
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import sys
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+# Support running this file directly: `python brd_agent_2\benchmark.py`
+if __package__ is None or __package__ == "":
+    _pkg_dir = Path(__file__).resolve().parent
+    _parent = str(_pkg_dir.parent)
+    _pkg_dir_str = str(_pkg_dir)
+    if _pkg_dir_str in sys.path:
+        sys.path.remove(_pkg_dir_str)
+    if _parent not in sys.path:
+        sys.path.insert(0, _parent)
+
+from brd_agent_2.brd_agent_2 import (
+    add_policy_arguments,
+    add_runtime_arguments,
+    configure_runtime,
+    state_from_args,
+)
+from brd_agent_2.config import Settings
+from brd_agent_2.graph import build_graph
+from brd_agent_2.llm_utils import (
+    aclose_async_client,
+    agenerate_text_with_usage,
+    astream_text,
+    configure_http,
+    generate_text_with_usage,
+    stream_text,
+)
+from brd_agent_2.metrics import RunMetrics, record_run
+from brd_agent_2.models import (
+    BRDModel,
+    BRDOutline,
+    BRDState,
+    BRDTemplateSpec,
+    Evidence,
+    Fact,
+    FactPack,
+    GapItem,
+    GapReport,
+    IntakeSummary,
+    TemplateSectionSpec,
+)
+from brd_agent_2.template import FALLBACK_SECTION_NAMES
+from brd_agent_2.tokens import count_tokens
+
+BASE_TRANSCRIPT = Path(__file__).resolve().parent / "meeting_transcript_short.txt"
+
+_SOURCE_HEADER = re.compile(r"^\[SOURCE: (?P<name>[^|\]]+?)(?: \| (?P<locator>[^\]]+))?\]$", re.MULTILINE)
+_SPEAKER_LINE = re.compile(r"^[A-Z][A-Z' -]+, [A-Z][A-Z' -]+ \d+:\d{2}$")
+_TIMESTAMP = re.compile(r"(?P<min>\d+):(?P<sec>\d{2})$")
+_FACT_CATEGORIES = {
+    "risk": "risks",
+    "constraint": "constraints",
+    "assumption": "assumptions",
+    "out of scope": "scope_out",
+    "authentication": "security_compliance",
+    "data": "data_sources",
+}
+
+
+def synthetic_transcript(base: str, scale: int) -> str:
+    # Session 1 is the original meeting; later sessions shift the timestamps and tag every utterance
+    # so the text (and every content hash derived from it) differs from session to session.
+    lines = base.splitlines()
+    sessions = []
+    for session in range(1, scale + 1):
+        if session == 1:
+            sessions.append(base.strip())
+            continue
+        out = [f"{lines[0]} - Follow-up Session {session}"]
+        offset = (session - 1) * 30
+        for line in lines[1:]:
+            if _SPEAKER_LINE.match(line.strip()):
+                line = _TIMESTAMP.sub(lambda m: f"{int(m.group('min')) + offset}:{m.group('sec')}", line.strip())
+            elif line.strip() and not line.startswith("Date:"):
+                line = f"{line.rstrip('.')} (workstream {session})."
+            out.append(line)
+        sessions.append("\n".join(out).strip())
+    return "\n\n".join(sessions) + "\n"
+
+
+def write_inputs(workdir: Path, scale: int, base: str) -> Path:
+    path = workdir / f"transcript_{scale}x.txt"
+    path.write_text(synthetic_transcript(base, scale), encoding="utf-8")
+    return path
+
+
+def write_template(workdir: Path) -> Path:
+    spec = BRDTemplateSpec(
+        sections=[TemplateSectionSpec(name=name, required_fields=["content"]) for name in FALLBACK_SECTION_NAMES]
+    )
+    path = workdir / "template.spec.json"
+    path.write_text(spec.model_dump_json(indent=2), encoding="utf-8")
+    return path
+
+
+def _prompt_kind(prompt: str) -> str:
+    # Checked most specific first: section, outline and gap prompts all embed FactPack JSON.
+    if "normalize terminology" in prompt:
+        return "terminology"
+    if "route BRD review feedback" in prompt:
+        return "routing"
+    if "Return the section as clean markdown" in prompt:
+        return "section"
+    if '"brd_markdown"' in prompt:
+        return "assembler"
+    if "BRDOutline schema" in prompt:
+        return "outline"
+    if "GapReport schema" in prompt:
+        return "gap"
+    if "IntakeSummary schema" in prompt:
+        return "intake"
+    if "FactPack schema" in prompt:
+        return "facts"
+    return "other"
+
+
+def _json_after(prompt: str, marker: str) -> Any:
+    start = prompt.find(marker)
+    if start < 0:
+        return None
+    try:
+        return json.JSONDecoder().raw_decode(prompt[start + len(marker):].lstrip())[0]
+    except ValueError:
+        return None
+
+
+def _fact_reply(prompt: str, facts_per_chunk: int) -> str:
+    pack = FactPack()
+    header = _SOURCE_HEADER.search(prompt)
+    if header is None:
+        return pack.model_dump_json()
+    source_name = header.group("name").strip()
+    locator = (header.group("locator") or "").strip()
+    body = prompt[header.end():]
+    utterances = [
+        line.strip()
+        for line in body.splitlines()
+        if line.strip() and not _SPEAKER_LINE.match(line.strip()) and not line.startswith(("OPTIONAL_BROWNFIELD", "["))
+    ]
+    for statement in utterances[:facts_per_chunk]:
+        lowered = statement.lower()
+        category = next((c for key, c in _FACT_CATEGORIES.items() if key in lowered), "requirements")
+        evidence = Evidence(source_name=source_name, locator=locator, quote=statement[:120])
+        getattr(pack, category).append(Fact(statement=statement, evidence=[evidence]))
+    return pack.model_dump_json()
+
+
+def _outline_reply(prompt: str) -> str:
+    template = _json_after(prompt, "TEMPLATE (BRDTemplateSpec instance):") or {}
+    names = [s["name"] for s in template.get("sections", []) if s.get("name")]
+    return BRDOutline(ordered_sections=names or list(FALLBACK_SECTION_NAMES)).model_dump_json()
+
+
+def _gap_reply(prompt: str) -> str:
+    template = _json_after(prompt, "TEMPLATE (BRDTemplateSpec instance):") or {}
+    names = [s["name"] for s in template.get("sections", []) if s.get("name")]
+    gaps = GapReport()
+    if names:
+        gaps.non_blocking.append(
+            GapItem(
+                section=names[-1],
+                field="content",
+                severity="non_blocking",
+                suggested_evidence_to_provide="Confirm the supporting documents to list.",
+            )
+        )
+    return gaps.model_dump_json()
+
+
+def _section_reply(prompt: str, words: int) -> str:
+    name = prompt.split("- Generate the ", 1)[-1].split(" section content.", 1)[0]
+    sources = sorted({f"{m.group('name').strip()}, {m.group('locator') or 'n/a'}" for m in _SOURCE_HEADER.finditer(prompt)})
+    filler = " ".join(["The platform records sensory results for trend analysis."] * max(1, words // 8))
+    citations = "\n".join(f"- ({source})" for source in sources[:5]) or "- (inputs, n/a)"
+    return f"## {name}\n\n{filler}\n\n### Citations\n{citations}\n"
+
+
+def _assembler_reply() -> str:
+    model = BRDModel(sections=["Synthetic section"], open_questions=[])
+    return json.dumps({"brd_model": model.model_dump(), "brd_markdown": "# BRD\n\nSynthetic section\n"})
+
+
+def stub_reply(prompt: str, kind: str, facts_per_chunk: int, section_words: int) -> str:
+    if kind == "facts":
+        return _fact_reply(prompt, facts_per_chunk)
+    if kind == "intake":
+        return IntakeSummary(
+            project_name="R&D Sensory Insights Platform",
+            project_type="greenfield",
+            primary_workflows=["Test request intake", "Vendor result upload"],
+        ).model_dump_json()
+    if kind == "gap":
+        return _gap_reply(prompt)
+    if kind == "outline":
+        return _outline_reply(prompt)
+    if kind == "section":
+        return _section_reply(prompt, section_words)
+    if kind == "assembler":
+        return _assembler_reply()
+    if kind == "routing":
+        return json.dumps({"sections": [], "applies_to_all": True})
+    return "{}"
+
+
+class StubModelServer:
+    """Local stand-in for the auth and model services with configurable latency and jitter."""
+
+    def __init__(
+        self,
+        latency_ms: float,
+        jitter_ms: float,
+        prefill_ms_per_1k: float,
+        facts_per_chunk: int,
+        section_words: int,
+        seed: int,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+        self.facts_per_chunk = facts_per_chunk
+        self.section_words = section_words
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests: List[Dict[str, Any]] = []
+        # Error injection for the retry check: one scripted fault per model request, then normal replies.
+        self.retry_after_seconds = 0.0
+        self.statuses: List[int] = []
+        self._faults: List[int] = []
+        self._tokens_issued = 0
+        self._revoked: set[str] = set()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="brd-stub", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "StubModelServer":
+        self._thread.start()
+        os.environ.update(
+            AUTH_SERVICE_BASE_URL=self.url,
+            MODEL_AS_A_SERVICE_BASE_URL=self.url,
+            CLIENT_ID=os.getenv("CLIENT_ID") or "benchmark",
+            CLIENT_SECRET=os.getenv("CLIENT_SECRET") or "benchmark",
+        )
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def take_requests(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            taken, self.requests = self.requests, []
+        return taken
+
+    @property
+    def tokens_issued(self) -> int:
+        return self._tokens_issued
+
+    def inject(self, faults: Sequence[int], retry_after_seconds: float = 0.0) -> None:
+        # 429/5xx answer with that status (and Retry-After); 401 also revokes the caller's token for good.
+        with self._lock:
+            self._faults = list(faults)
+            self.retry_after_seconds = retry_after_seconds
+            self.statuses = []
+
+    def issue_token(self) -> str:
+        with self._lock:
+            self._tokens_issued += 1
+            return f"benchmark-token-{self._tokens_issued}"
+
+    def fault_for(self, token: str) -> Optional[int]:
+        with self._lock:
+            status = None
+            if token in self._revoked:
+                status = 401
+            elif self._faults:
+                status = self._faults.pop(0)
+                if status == 401:
+                    self._revoked.add(token)
+            self.statuses.append(status or 200)
+            return status
+
+    def delay_seconds(self, prompt_tokens: int) -> float:
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        millis = self.latency_ms + jitter + self.prefill_ms_per_1k * prompt_tokens / 1000
+        return max(0.0, millis) / 1000
+
+    def complete(self, payload: Dict[str, Any]) -> tuple[str, Dict[str, int]]:
+        prompt = payload["messages"][0]["content"]
+        kind = _prompt_kind(prompt)
+        prompt_tokens = count_tokens(prompt)
+        time.sleep(self.delay_seconds(prompt_tokens))
+        content = stub_reply(prompt, kind, self.facts_per_chunk, self.section_words)
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": count_tokens(content)}
+        with self._lock:
+            self.requests.append({"kind": kind, "prompt_chars": len(prompt), **usage})
+        return content, usage
+
+    def _handler(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+            def _send_json(self, body: Dict[str, Any]) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_fault(self, status: int) -> None:
+                data = json.dumps({"error": f"injected {status}"}).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status != 401:
+                    self.send_header("Retry-After", str(server.retry_after_seconds))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _send_stream(self, content: str, usage: Dict[str, int]) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for start in range(0, len(content), 32):
+                    event = {"choices": [{"delta": {"content": content[start:start + 32]}}]}
+                    self._send_chunk(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                self._send_chunk(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def do_POST(self) -> None:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if self.path.endswith("/generate-token"):
+                    self._send_json({"token": server.issue_token()})
+                    return
+                status = server.fault_for(self.headers.get("Authorization", "").removeprefix("Bearer "))
+                if status is not None:
+                    self._send_fault(status)
+                    return
+                content, usage = server.complete(payload)
+                if payload.get("stream"):
+                    self._send_stream(content, usage)
+                else:
+                    self._send_json({"choices": [{"message": {"content": content}}], "usage": usage})
+
+        return Handler
+
+
+def _run_state(args: argparse.Namespace, template: Path, inputs: Path, output: Path, run_id: str) -> BRDState:
+    return state_from_args(args, str(output), run_id=run_id, template_path=str(template), inputs=[str(inputs)])
+
+
+async def _ainvoke(graph: Any, state: BRDState) -> None:
+    try:
+        await graph.ainvoke(state)
+    finally:
+        # The async client is bound to the event loop, and every run gets a fresh loop.
+        await aclose_async_client()
+
+
+def _prompt_stats(requests: List[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    stats: Dict[str, Dict[str, int]] = {}
+    for request in requests:
+        kind = stats.setdefault(
+            request["kind"], {"calls": 0, "prompt_chars": 0, "prompt_tokens": 0, "max_prompt_tokens": 0}
+        )
+        kind["calls"] += 1
+        kind["prompt_chars"] += request["prompt_chars"]
+        kind["prompt_tokens"] += request["prompt_tokens"]
+        kind["max_prompt_tokens"] = max(kind["max_prompt_tokens"], request["prompt_tokens"])
+    return stats
+
+
+def run_once(
+    graph: Any,
+    args: argparse.Namespace,
+    server: StubModelServer,
+    state: BRDState,
+) -> Dict[str, Any]:
+    server.take_requests()
+    if args.tracemalloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            # Node progress lines would drown the benchmark output.
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        run = stack.enter_context(record_run())
+        if args.use_async:
+            asyncio.run(_ainvoke(graph, state))
+        else:
+            graph.invoke(state)
+    wall = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else 0
+    if args.tracemalloc:
+        tracemalloc.stop()
+    requests = server.take_requests()
+    return _run_record(run, wall, peak, requests)
+
+
+def _run_record(run: RunMetrics, wall: float, peak: int, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+    totals = run.totals()
+    prompt_tokens = [r["prompt_tokens"] for r in requests]
+    return {
+        "wall_seconds": round(wall, 3),
+        "peak_traced_mb": round(peak / (1024 * 1024), 2),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "llm_calls": totals["llm_calls"],
+        "cache_hits": totals["cache_hits"],
+        "prompt_tokens": sum(prompt_tokens),
+        "max_prompt_tokens": max(prompt_tokens, default=0),
+        "completion_tokens": sum(r["completion_tokens"] for r in requests),
+        "llm_p50_seconds": totals["llm_p50_seconds"],
+        "llm_p95_seconds": totals["llm_p95_seconds"],
+        "nodes": {name: stats["seconds"] for name, stats in run.as_dict()["nodes"].items()},
+        "prompts": _prompt_stats(requests),
+    }
+
+
+def write_report(path: str, results: List[Dict[str, Any]]) -> None:
+    # .csv gives one row per run and node; anything else is the full JSON.
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.suffix.lower() == ".csv":
+        with target.open("w", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(["scale", "repeat", "input_bytes", "node", "seconds", "wall_seconds", "peak_traced_mb"])
+            for result in results:
+                for node, seconds in result["nodes"].items():
+                    writer.writerow(
+                        [
+                            result["scale"],
+                            result["repeat"],
+                            result["input_bytes"],
+                            node,
+                            seconds,
+                            result["wall_seconds"],
+                            result["peak_traced_mb"],
+                        ]
+                    )
+    else:
+        target.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+def print_summary(results: List[Dict[str, Any]]) -> None:
+    print(
+        f"{'scale':>6} {'input_kb':>9} {'wall_s':>8} {'calls':>6} {'prompt_tok':>11} "
+        f"{'max_prompt':>11} {'peak_mb':>8} {'p50_s':>6} {'p95_s':>6}"
+    )
+    by_scale: Dict[int, List[Dict[str, Any]]] = {}
+    for result in results:
+        by_scale.setdefault(result["scale"], []).append(result)
+    for scale, runs in by_scale.items():
+        first = runs[0]
+        print(
+            f"{scale:>6} {first['input_bytes'] / 1024:>9.1f} "
+            f"{statistics.median(r['wall_seconds'] for r in runs):>8.2f} {first['llm_calls']:>6} "
+            f"{first['prompt_tokens']:>11} {first['max_prompt_tokens']:>11} "
+            f"{max(r['peak_traced_mb'] for r in runs):>8.1f} "
+            f"{first['llm_p50_seconds']:>6.2f} {first['llm_p95_seconds']:>6.2f}"
+        )
+    nodes = list(dict.fromkeys(node for result in results for node in result["nodes"]))
+    print()
+    print(f"{'node (median s)':<28}" + "".join(f"{scale:>9}x" for scale in by_scale))
+    for node in nodes:
+        cells = [statistics.median(r["nodes"].get(node, 0.0) for r in runs) for runs in by_scale.values()]
+        print(f"{node:<28}" + "".join(f"{cell:>10.3f}" for cell in cells))
+
+
+_RETRY_FAULTS = (429, 503, 401)
+_RETRY_AFTER_SECONDS = 0.3
+
+
+async def _acall(call: Callable[..., Awaitable[tuple[str, dict]]], prompt: str) -> tuple[str, dict]:
+    try:
+        return await call(prompt, max_tokens=50, use_cache=False)
+    finally:
+        await aclose_async_client()
+
+
+def check_retries(args: argparse.Namespace) -> bool:
+    """Checks retries, Retry-After and token refresh on the sync, async and streaming paths against the stub."""
+    configure_http(pool_size=args.http_pool_size, max_retries=len(_RETRY_FAULTS), backoff_seconds=0.05)
+    server = StubModelServer(0.0, 0.0, 0.0, args.facts_per_chunk, args.section_words, args.seed).start()
+    paths: Dict[str, Callable[[str], tuple[str, dict]]] = {
+        "sync": lambda prompt: generate_text_with_usage(prompt, max_tokens=50, use_cache=False),
+        "async": lambda prompt: asyncio.run(_acall(agenerate_text_with_usage, prompt)),
+        "stream": lambda prompt: stream_text(prompt, max_tokens=50, use_cache=False),
+        "async-stream": lambda prompt: asyncio.run(_acall(astream_text, prompt)),
+    }
+    # 429 and 503 are retried (honouring Retry-After); the 401 revokes the token, so only a refresh succeeds.
+    expected = [*_RETRY_FAULTS, 200]
+    passed = True
+    try:
+        # A clean call first, so the initial token fetch is not mistaken for a refresh.
+        generate_text_with_usage("Retry check warm-up.", max_tokens=50, use_cache=False)
+        for name, call in paths.items():
+            server.inject(_RETRY_FAULTS, retry_after_seconds=_RETRY_AFTER_SECONDS)
+            tokens_before = server.tokens_issued
+            started = time.perf_counter()
+            with record_run() as run:
+                try:
+                    content, _ = call(f"Retry check ({name}): reply with an empty JSON object.")
+                    error = None
+                except Exception as exc:
+                    content, error = "", f"{type(exc).__name__}: {exc}"
+            elapsed = time.perf_counter() - started
+            failures = [error] if error else []
+            if server.statuses != expected:
+                failures.append(f"statuses {server.statuses} != {expected}")
+            if run.totals()["retries"] != len(_RETRY_FAULTS) - 1:
+                failures.append(f"retries={run.totals()['retries']}")
+            if server.tokens_issued != tokens_before + 1:
+                failures.append(f"token refreshed {server.tokens_issued - tokens_before} time(s)")
+            if elapsed < _RETRY_AFTER_SECONDS:
+                failures.append(f"Retry-After ignored ({elapsed:.2f}s)")
+            if not error and not content:
+                failures.append("empty completion")
+            passed = passed and not failures
+            print(f"[retry-check] {name:<13} {'ok' if not failures else 'FAIL ' + '; '.join(failures)} ({elapsed:.2f}s)")
+    finally:
+        server.stop()
+    return passed
+
+
+def parse_args() -> argparse.Namespace:
+    settings = Settings()
+    parser = argparse.ArgumentParser(
+        description="Offline benchmark: runs the full graph against a local stub of the model service"
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[1, 4, 16, 64],
+        help="Synthetic transcript sizes, in copies of the base transcript (one benchmark run per scale)",
+    )
+    parser.add_argument(
+        "--base-transcript",
+        default=str(BASE_TRANSCRIPT),
+        help="Transcript the synthetic inputs are generated from",
+    )
+    parser.add_argument(
+        "--template",
+        default=None,
+        help="Template PDF or spec JSON (default: a generated spec with the standard sections)",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scale; the summary shows the median")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Base latency of every stub completion")
+    parser.add_argument("--jitter-ms", type=float, default=50.0, help="Uniform +/- jitter added to the latency")
+    parser.add_argument(
+        "--prefill-ms-per-1k",
+        type=float,
+        default=20.0,
+        help="Extra stub latency per 1k prompt tokens, so smaller prompts show up in wall time",
+    )
+    parser.add_argument("--facts-per-chunk", type=int, default=6, help="Facts the stub returns per extraction chunk")
+    parser.add_argument("--section-words", type=int, default=200, help="Approximate words per stub section draft")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the latency jitter")
+    parser.add_argument("--workdir", default=None, help="Keep inputs and outputs here instead of a temp directory")
+    parser.add_argument("--report", action="append", default=[], help="Write results to .json or .csv (repeatable)")
+    parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false", help="Skip peak memory tracing")
+    parser.add_argument("--verbose", action="store_true", help="Show node output during runs")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Benchmark the async graph")
+    parser.add_argument(
+        "--check-retries",
+        action="store_true",
+        help="Instead of benchmarking, check retries, Retry-After and token refresh against an erroring stub "
+        "(sync, async and streaming clients); exits non-zero on failure",
+    )
+    add_runtime_arguments(parser, settings)
+    add_policy_arguments(parser, gap_default="force-generate", review_default="auto-approve")
+    parser.set_defaults(trace_level="off")
+    return parser.parse_args()
+
+
+def run_benchmark(args: argparse.Namespace, workdir: Path) -> List[Dict[str, Any]]:
+    base = Path(args.base_transcript).read_text(encoding="utf-8")
+    template = Path(args.template) if args.template else write_template(workdir)
+    graph = build_graph(use_async=args.use_async).compile()
+    server = StubModelServer(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        prefill_ms_per_1k=args.prefill_ms_per_1k,
+        facts_per_chunk=args.facts_per_chunk,
+        section_words=args.section_words,
+        seed=args.seed,
+    ).start()
+    results = []
+    try:
+        for scale in args.scales:
+            inputs = write_inputs(workdir, scale, base)
+            for repeat in range(args.repeat):
+                run_id = f"bench-{scale}x-{repeat}"
+                state = _run_state(args, template, inputs, workdir / f"{run_id}.docx", run_id)
+                record = run_once(graph, args, server, state)
+                record = {"scale": scale, "repeat": repeat, "input_bytes": inputs.stat().st_size, **record}
+                results.append(record)
+                print(
+                    f"[bench] scale={scale}x run={repeat} wall={record['wall_seconds']}s "
+                    f"calls={record['llm_calls']} prompt_tokens={record['prompt_tokens']} "
+                    f"peak_mb={record['peak_traced_mb']}"
+                )
+    finally:
+        server.stop()
+    return results
+
+
+def main() -> None:
+    args = parse_args()
+    configure_runtime(args)
+    if args.check_retries:
+        raise SystemExit(0 if check_retries(args) else 1)
+    if args.workdir:
+        workdir = Path(args.workdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+        results = run_benchmark(args, workdir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="brd_bench_") as tmp:
+            results = run_benchmark(args, Path(tmp))
+    print()
+    print_summary(results)
+    for path in args.report:
+        write_report(path, results)
+        print(f"[bench] report written to {path}")
+
+
+if __name__ == "__main__":
+    main()
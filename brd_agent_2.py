@@ -1,8 +1,11 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 from pathlib import Path
 import sys
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
 
@@ -17,9 +20,24 @@ if __package__ is None or __package__ == "":
     if _parent not in sys.path:
         sys.path.insert(0, _parent)
 
+from brd_agent_2.assembly import ASSEMBLER_MODES
+from brd_agent_2.budget import TokenBudgetExceededError
+from brd_agent_2.checkpoints import checkpoint_store, configure_checkpoints
 from brd_agent_2.config import Settings
+from brd_agent_2.debug import TRACE_LEVELS, configure_tracing
 from brd_agent_2.models import BRDState
-from brd_agent_2.graph import build_graph
+from brd_agent_2.review_policies import GAP_POLICIES, REVIEW_POLICIES, BlockingGapsError
+from brd_agent_2.graph import END, build_graph, next_node
+from brd_agent_2.llm_utils import (
+    aclose_async_client,
+    configure_async,
+    configure_http,
+    configure_response_cache,
+    response_cache_stats,
+)
+from brd_agent_2.metrics import RunMetrics, record_run
+from brd_agent_2.nodes.intake_nodes import reload_sources
+from brd_agent_2.tokens import configure_tokenizer
 
 
 def parse_args() -> argparse.Namespace:
@@ -28,13 +46,13 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--template",
         default=settings.default_template_path,
-        help="Path to BRD template PDF",
+        help="Path to BRD template PDF (or a precompiled .spec.json template spec)",
     )
     parser.add_argument(
         "--inputs",
         nargs="+",
-        required=True,
-        help="Input files or directories containing transcripts and documents",
+        default=None,
+        help="Input files or directories containing transcripts and documents (not needed with --resume)",
     )
     parser.add_argument(
         "--brownfield-inputs",
@@ -47,9 +65,288 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Optional path to save BRD as .docx (default in brd_agent_2 folder)",
     )
-    parser.add_argument("--chunk-size", type=int, default=settings.default_chunk_size)
-    parser.add_argument("--max-chunks", type=int, default=settings.default_max_chunks)
-    return parser.parse_args()
+    add_runtime_arguments(parser, settings)
+    add_policy_arguments(parser, gap_default="interactive", review_default="interactive")
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Run LLM nodes on the asyncio client instead of blocking threads",
+    )
+    parser.add_argument(
+        "--run-id",
+        default=None,
+        help="Identifier for this run's checkpoints (default: random)",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        default=None,
+        help="Continue a checkpointed run from its last completed node (requires --checkpoint-db); "
+        "inputs and pipeline settings are taken from the checkpoint",
+    )
+    args = parser.parse_args()
+    if not args.inputs and not args.resume:
+        parser.error("--inputs is required unless --resume is given")
+    return args
+
+
+def add_policy_arguments(parser: argparse.ArgumentParser, gap_default: str, review_default: str) -> None:
+    parser.add_argument(
+        "--gap-policy",
+        choices=GAP_POLICIES,
+        default=gap_default,
+        help="How gap review is decided (non-interactive policies run headless)",
+    )
+    parser.add_argument(
+        "--review-policy",
+        choices=REVIEW_POLICIES,
+        default=review_default,
+        help="How the generated BRD is approved or sent back with feedback",
+    )
+    parser.add_argument(
+        "--decisions",
+        default=None,
+        help='JSON file of {"gap": [...], "review": [...]} decisions for the "file" policies',
+    )
+    parser.add_argument(
+        "--speculate",
+        action="store_true",
+        help="While an interactive/queue gap review is pending, write the outline and sections in the "
+        "background; kept on 'generate anyway', discarded (cost reported) otherwise",
+    )
+    parser.add_argument(
+        "--max-gap-rounds",
+        type=int,
+        default=Settings().default_max_gap_rounds,
+        help="Stop after this many gap reviews that ask for more inputs instead of generating",
+    )
+
+
+def add_runtime_arguments(parser: argparse.ArgumentParser, settings: Settings) -> None:
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=settings.default_chunk_size,
+        help="Maximum characters per fact-extraction chunk",
+    )
+    parser.add_argument(
+        "--max-chunks",
+        type=int,
+        default=settings.default_max_chunks,
+        help="Maximum number of chunks sent to fact extraction",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=settings.default_max_concurrency,
+        help="Maximum number of concurrent LLM calls within a node (1 = sequential)",
+    )
+    parser.add_argument(
+        "--loader-workers",
+        type=int,
+        default=settings.default_loader_workers,
+        help="Worker processes for PDF/PPTX/DOCX text extraction (0 or 1 = in-process)",
+    )
+    parser.add_argument(
+        "--extract-cache",
+        default=None,
+        help="Optional directory caching extracted document text by path, size and mtime",
+    )
+    parser.add_argument(
+        "--near-duplicate-threshold",
+        type=float,
+        default=settings.default_near_duplicate_threshold,
+        help="Skip inputs whose estimated word-shingle similarity to an already loaded one reaches this "
+        "(1.0 = only exact content matches)",
+    )
+    parser.add_argument(
+        "--retrieval-top-k",
+        type=int,
+        default=settings.default_retrieval_top_k,
+        help="Passages retrieved per section prompt (0 = paste every input into each section)",
+    )
+    parser.add_argument(
+        "--section-context-tokens",
+        type=int,
+        default=settings.default_section_context_tokens,
+        help="Token budget for retrieved facts and passages in each section prompt",
+    )
+    parser.add_argument(
+        "--llm-cache",
+        default=None,
+        help="Optional SQLite file used to cache LLM completions across runs",
+    )
+    parser.add_argument(
+        "--llm-cache-max-mb",
+        type=int,
+        default=settings.default_llm_cache_max_mb,
+        help="Evict least recently used cached completions beyond this size",
+    )
+    parser.add_argument(
+        "--llm-cache-max-age-hours",
+        type=float,
+        default=settings.default_llm_cache_max_age_hours,
+        help="Ignore and evict cached completions older than this",
+    )
+    parser.add_argument(
+        "--llm-cache-bypass",
+        action="store_true",
+        help="Do not read from the LLM cache (fresh completions are still written)",
+    )
+    parser.add_argument(
+        "--http-pool-size",
+        type=int,
+        default=settings.default_http_pool_size,
+        help="Maximum pooled keep-alive connections to the model service",
+    )
+    parser.add_argument(
+        "--http-max-retries",
+        type=int,
+        default=settings.default_http_max_retries,
+        help="Retries for 429/5xx responses and connection errors",
+    )
+    parser.add_argument(
+        "--http-backoff-seconds",
+        type=float,
+        default=settings.default_http_backoff_seconds,
+        help="Base delay for exponential backoff with jitter between retries",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=settings.default_max_in_flight,
+        help="Global cap on concurrent model requests in async mode",
+    )
+    parser.add_argument(
+        "--context-tokens",
+        type=int,
+        default=settings.default_context_tokens,
+        help="Model context window; prompts are trimmed to fit and oversized ones fail before sending",
+    )
+    parser.add_argument(
+        "--tokenizer-encoding",
+        default=settings.default_tokenizer_encoding,
+        help="tiktoken encoding used for token counts (falls back to a length estimate if unavailable)",
+    )
+    parser.add_argument(
+        "--trace-level",
+        choices=TRACE_LEVELS,
+        default="summary",
+        help="Per-node tracing: summary lines by default; full also writes whole-state snapshots to --trace-file",
+    )
+    parser.add_argument(
+        "--trace-file",
+        default=None,
+        help="JSONL file for full state snapshots (default: brd_trace.jsonl in the output folder)",
+    )
+    parser.add_argument(
+        "--metrics-report",
+        action="append",
+        default=[],
+        help="Write the run report (per-node latency, retries, cache hits, tokens, bytes) to this path; "
+        "format follows the extension: .json, .csv or .prom (repeatable)",
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=None,
+        help="Stop the run before the next model-calling node once this many tokens have been spent "
+        "(cache hits are free; on --resume this replaces the saved budget)",
+    )
+    parser.add_argument(
+        "--assembler",
+        choices=ASSEMBLER_MODES,
+        default="local",
+        help="local: assemble drafts without the model; normalize: plus a small terminology pass; llm: full prompt",
+    )
+    parser.add_argument(
+        "--checkpoint-db",
+        default=None,
+        help="SQLite file receiving a compact checkpoint after every node; combine with --llm-cache so "
+        "calls finished inside an interrupted node are not paid for twice on --resume",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream section and assembler completions and report time-to-first-token and tokens/sec",
+    )
+    parser.add_argument(
+        "--stream-dir",
+        default=None,
+        help="Directory where streamed section drafts are written as they arrive "
+        "(default with --stream: <output stem>_stream next to the output document)",
+    )
+
+
+def default_stream_dir(stream: bool, stream_dir: Optional[str], output_docx: str) -> Optional[str]:
+    # Concurrent sections are not echoed to the console, so --stream always has somewhere to write them.
+    if stream_dir or not stream:
+        return stream_dir
+    path = Path(output_docx)
+    return str(path.with_name(f"{path.stem}_stream"))
+
+
+def configure_runtime(args: argparse.Namespace) -> None:
+    configure_http(
+        pool_size=args.http_pool_size,
+        max_retries=args.http_max_retries,
+        backoff_seconds=args.http_backoff_seconds,
+    )
+    configure_async(max_in_flight=args.max_in_flight)
+    configure_tokenizer(context_tokens=args.context_tokens, encoding=args.tokenizer_encoding)
+    trace_file = args.trace_file or str(Path(Settings().default_output_dir) / "brd_trace.jsonl")
+    configure_tracing(args.trace_level, trace_file if args.trace_level == "full" else None)
+    configure_checkpoints(args.checkpoint_db)
+    configure_response_cache(
+        args.llm_cache,
+        max_bytes=args.llm_cache_max_mb * 1024 * 1024,
+        max_age_seconds=args.llm_cache_max_age_hours * 3600,
+        bypass=args.llm_cache_bypass,
+    )
+
+
+def write_metrics_reports(run: RunMetrics, paths: List[str]) -> None:
+    totals = run.totals()
+    print(
+        f"[metrics] wall_seconds={totals['wall_seconds']} llm_calls={totals['llm_calls']} "
+        f"cache_hits={totals['cache_hits']} retries={totals['retries']} tokens_used={totals['total_tokens']} "
+        f"bytes_loaded={totals['bytes_loaded']} dedup_tokens_saved={totals['dedup_tokens_saved']} "
+        f"encoding_tokens_saved={totals['encoding_tokens_saved']}"
+    )
+    for path in paths:
+        run.write_report(path)
+        print(f"[metrics] report written to {path}")
+
+
+def resume_point(run_id: str) -> Optional[Tuple[BRDState, str]]:
+    store = checkpoint_store()
+    if store is None:
+        raise SystemExit("--resume requires --checkpoint-db")
+    saved = store.latest(run_id)
+    if saved is None:
+        return None
+    completed, data = saved
+    state = BRDState(**data)
+    # After load_sources the route depends on the corpus (sources_branch compares it with gaps_inputs_key),
+    # and checkpoints do not store raw texts, so they are reloaded before routing.
+    reloaded = completed == "load_sources"
+    if reloaded:
+        reload_sources(state)
+    entry = next_node(completed, state)
+    print(f"[resume] run_id={run_id} last_completed={completed} next={entry}")
+    if entry != END and not response_cache_stats():
+        print("[resume] no --llm-cache set; calls finished inside the interrupted node will be made again")
+    if not reloaded and entry not in {END, "load_sources"}:
+        reload_sources(state)
+    return state, entry
+
+
+async def _ainvoke(graph, initial_state: BRDState) -> None:
+    try:
+        await graph.ainvoke(initial_state)
+    finally:
+        await aclose_async_client()
 
 
 def main() -> None:
@@ -60,16 +357,97 @@ def main() -> None:
     if not output_docx:
         output_docx = str(Path(Settings().default_output_dir) / "brd_output.docx")
 
-    graph = build_graph().compile()
-    initial_state = BRDState(
+    configure_runtime(args)
+
+    if args.resume:
+        point = resume_point(args.resume)
+        if point is None:
+            raise SystemExit(f"No checkpoint found for run {args.resume}")
+        initial_state, entry = point
+        if args.output_docx:
+            initial_state.output_docx_path = args.output_docx
+        if args.token_budget is not None:
+            initial_state.token_budget = args.token_budget
+        if entry == END:
+            if initial_state.stop_reason:
+                print(f"[resume] run {args.resume} stopped at gap review: {initial_state.stop_reason}")
+            else:
+                print(f"[resume] run {args.resume} already completed")
+            return
+    else:
+        initial_state = _initial_state(args, output_docx)
+        entry = "load_sources"
+    if checkpoint_store() is not None:
+        print(f"[checkpoint] run_id={initial_state.run_id} (continue with --resume {initial_state.run_id})")
+
+    graph = build_graph(use_async=args.use_async, entry=entry).compile()
+    exit_code = 0
+    with record_run() as run:
+        try:
+            if args.use_async:
+                asyncio.run(_ainvoke(graph, initial_state))
+            else:
+                graph.invoke(initial_state)
+        except TokenBudgetExceededError as exc:
+            print(f"[budget] {exc}")
+            if checkpoint_store() is not None:
+                print(f"[budget] raise --token-budget and continue with --resume {initial_state.run_id}")
+        except BlockingGapsError as exc:
+            print(f"[gaps] fail-on-blocking: {len(exc.gaps)} blocking gap(s); no BRD was generated")
+            for gap in exc.gaps:
+                print(f"  - {gap.section}/{gap.field}: {gap.suggested_evidence_to_provide}")
+            exit_code = 1
+    write_metrics_reports(run, args.metrics_report)
+    if response_cache_stats():
+        print(f"[llm_cache] {response_cache_stats()}")
+    if exit_code:
+        raise SystemExit(exit_code)
+
+
+# BRDState fields set from pipeline options, keyed by their argparse dest (also the batch manifest key).
+_STATE_OPTIONS: Dict[str, str] = {
+    "chunk_size": "chunk_size",
+    "max_chunks": "max_chunks",
+    "max_concurrency": "max_concurrency",
+    "loader_workers": "loader_workers",
+    "extract_cache_dir": "extract_cache",
+    "near_duplicate_threshold": "near_duplicate_threshold",
+    "retrieval_top_k": "retrieval_top_k",
+    "section_context_tokens": "section_context_tokens",
+    "gap_policy": "gap_policy",
+    "review_policy": "review_policy",
+    "decisions_path": "decisions",
+    "max_gap_rounds": "max_gap_rounds",
+    "token_budget": "token_budget",
+    "speculate": "speculate",
+    "stream": "stream",
+    "stream_dir": "stream_dir",
+    "assembler_mode": "assembler",
+}
+
+
+def state_from_args(
+    args: argparse.Namespace,
+    output_docx: str,
+    overrides: Optional[Dict[str, Any]] = None,
+    **fields: Any,
+) -> BRDState:
+    # Shared by the CLI, batch and benchmark; a batch job's manifest entry overrides options by dest name.
+    overrides = overrides or {}
+    values = {name: overrides.get(dest, getattr(args, dest)) for name, dest in _STATE_OPTIONS.items()}
+    values["stream_dir"] = default_stream_dir(values["stream"], values["stream_dir"], output_docx)
+    return BRDState(output_docx_path=output_docx, **values, **fields)
+
+
+def _initial_state(args: argparse.Namespace, output_docx: str) -> BRDState:
+    return state_from_args(
+        args,
+        output_docx,
+        run_id=args.run_id or uuid.uuid4().hex[:12],
         template_path=args.template,
         inputs=args.inputs,
         brownfield_inputs=args.brownfield_inputs,
-        output_docx_path=output_docx,
-        chunk_size=args.chunk_size,
-        max_chunks=args.max_chunks,
     )
-    graph.invoke(initial_state)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import functools
+import inspect
+from typing import Any, Callable
+
+from .llm_utils import UsageTotals, track_usage
+from .models import BRDState
+
+
+class TokenBudgetExceededError(RuntimeError):
+    pass
+
+
+def _check(name: str, state: BRDState) -> None:
+    if state.token_budget is not None and state.tokens_used >= state.token_budget:
+        raise TokenBudgetExceededError(
+            f"token budget exhausted before {name}: used {state.tokens_used} of {state.token_budget}"
+        )
+
+
+def _charge(name: str, state: BRDState, result: Any, usage: UsageTotals) -> Any:
+    # Cache hits are free, so only tokens actually sent to the model count against the budget.
+    spent = state.node_tokens.get(name, 0) + usage.billed_tokens
+    if isinstance(result, BRDState):
+        result.node_tokens[name] = spent
+    elif isinstance(result, dict):
+        # Partial updates from parallel branches carry only their own node's counter.
+        result["node_tokens"] = {name: spent}
+    return result
+
+
+def budgeted(name: str, fn: Callable[[BRDState], Any], enforce: bool = True) -> Callable[[BRDState], Any]:
+    # The budget is checked before a model-calling node starts; a node already running is allowed to finish.
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def _async_node(state: BRDState) -> Any:
+            if enforce:
+                _check(name, state)
+            with track_usage() as usage:
+                result = await fn(state)
+            return _charge(name, state, result, usage)
+
+        return _async_node
+
+    @functools.wraps(fn)
+    def _node(state: BRDState) -> Any:
+        if enforce:
+            _check(name, state)
+        with track_usage() as usage:
+            result = fn(state)
+        return _charge(name, state, result, usage)
+
+    return _node
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .models import BRDState, merge_counts
+
+# Raw texts are re-read from the inputs on resume (cheap with --extract-cache), so they are never stored.
+# The template spec is reloaded from its sidecar. Everything the LLM produced is kept.
+_EXCLUDED_FIELDS = {"source_texts", "brownfield_texts", "loaded_files", "template_spec"}
+
+_STORE: "CheckpointStore | None" = None
+
+
+class CheckpointStore:
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS checkpoints (
+                run_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                node TEXT NOT NULL,
+                state BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (run_id, seq)
+            )"""
+        )
+        self._conn.commit()
+
+    def save(self, run_id: str, node: str, state: BRDState) -> int:
+        payload = state.model_dump_json(exclude=_EXCLUDED_FIELDS).encode("utf-8")
+        blob = zlib.compress(payload, 6)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM checkpoints WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT INTO checkpoints (run_id, seq, node, state, size, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, row[0] + 1, node, blob, len(blob), time.time()),
+            )
+            # Only the latest checkpoint is needed to resume; older ones are dropped to keep the file small.
+            self._conn.execute("DELETE FROM checkpoints WHERE run_id = ? AND seq <= ?", (run_id, row[0]))
+            self._conn.commit()
+        return len(blob)
+
+    def charge(self, run_id: str, node_tokens: Dict[str, int]) -> None:
+        # Folds tokens billed by a parallel branch into the latest checkpoint without moving the resume point.
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT seq, state FROM checkpoints WHERE run_id = ? ORDER BY seq DESC LIMIT 1", (run_id,)
+            ).fetchone()
+            if row is None:
+                return
+            data = json.loads(zlib.decompress(row[1]).decode("utf-8"))
+            data["node_tokens"] = merge_counts(data.get("node_tokens", {}), node_tokens)
+            blob = zlib.compress(json.dumps(data).encode("utf-8"), 6)
+            self._conn.execute(
+                "UPDATE checkpoints SET state = ?, size = ? WHERE run_id = ? AND seq = ?",
+                (blob, len(blob), run_id, row[0]),
+            )
+            self._conn.commit()
+
+    def latest(self, run_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT node, state FROM checkpoints WHERE run_id = ? ORDER BY seq DESC LIMIT 1", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(zlib.decompress(row[1]).decode("utf-8"))
+
+    def runs(self) -> List[Tuple[str, str, float]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT run_id, node, created FROM checkpoints ORDER BY created DESC"
+            ).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def configure_checkpoints(path: str | None) -> CheckpointStore | None:
+    global _STORE
+    if _STORE is not None:
+        _STORE.close()
+    _STORE = CheckpointStore(path) if path else None
+    return _STORE
+
+
+def checkpoint_store() -> CheckpointStore | None:
+    return _STORE
+
+
+def _save(name: str, state: BRDState, result: Any) -> None:
+    if _STORE is None or not state.run_id:
+        return
+    if isinstance(result, BRDState):
+        _STORE.save(state.run_id, name, result)
+    elif isinstance(result, dict) and result.get("node_tokens"):
+        # Parallel branches return partial dicts, which are not a resumable point on their own: a run
+        # interrupted inside the fan-out resumes at the node that fanned out. Their billed tokens are
+        # still recorded there, so the budget is not undercounted after a resume.
+        _STORE.charge(state.run_id, result["node_tokens"])
+
+
+def checkpointed(name: str, fn: Callable[[BRDState], Any]) -> Callable[[BRDState], Any]:
+    # A checkpoint is written only after the node returns, so resume restarts at the first unfinished node.
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def _async_node(state: BRDState) -> Any:
+            result = await fn(state)
+            _save(name, state, result)
+            return result
+
+        return _async_node
+
+    @functools.wraps(fn)
+    def _node(state: BRDState) -> Any:
+        result = fn(state)
+        _save(name, state, result)
+        return result
+
+    return _node
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+_SOURCE_HEADER = re.compile(r"^\[SOURCE: (?P<name>[^\]\n]+)\]\n")
+# Written by file_loaders.locator_marker for page-, slide- and paragraph-based formats.
+LOCATOR_MARKER = re.compile(r"^\[\[(?P<unit>page|slide|paragraph) (?P<index>\d+)\]\]$")
+
+
+@dataclass(frozen=True)
+class SourceChunk:
+    source_name: str
+    locator: str
+    text: str
+    label: Optional[str] = None
+    source_key: str = ""
+
+    def render(self) -> str:
+        return f"[SOURCE: {self.source_name} | {self.locator}]\n{self.text}"
+
+
+def strip_locator_markers(text: str) -> str:
+    # The markers number pages/slides/paragraphs, so they differ between formats and edits of the same content.
+    return "\n".join(line for line in text.splitlines() if not LOCATOR_MARKER.match(line))
+
+
+def content_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def split_source_header(text: str) -> tuple[str, str]:
+    match = _SOURCE_HEADER.match(text)
+    if not match:
+        return "unknown", text
+    return match.group("name"), text[match.end():]
+
+
+def _format_locator(unit: str, first: int, last: int) -> str:
+    return f"{unit} {first}" if first == last else f"{unit}s {first}-{last}"
+
+
+def _text_units(body: str) -> Iterator[tuple[str, int, str]]:
+    # Lines before any [[page N]]/[[slide N]]/[[paragraph N]] marker (or in unmarked text) are located by line number.
+    unit, index = "line", 0
+    for line_no, line in enumerate(body.splitlines(), start=1):
+        marker = LOCATOR_MARKER.match(line)
+        if marker:
+            unit, index = marker.group("unit"), int(marker.group("index"))
+            continue
+        yield (unit, line_no if unit == "line" else index, line)
+
+
+def _pack_units(
+    source_name: str,
+    units: Iterable[tuple[str, int, str]],
+    chunk_size: int,
+    label: Optional[str],
+    key: str,
+) -> Iterator[SourceChunk]:
+    chunk_size = max(1, chunk_size)
+    buffer: List[str] = []
+    size = 0
+    unit, first, last = "line", 0, 0
+
+    def _flush() -> Optional[SourceChunk]:
+        if buffer and any(part.strip() for part in buffer):
+            return SourceChunk(source_name, _format_locator(unit, first, last), "\n".join(buffer), label, key)
+        return None
+
+    for unit_name, index, line in units:
+        pieces = [line[i:i + chunk_size] for i in range(0, len(line), chunk_size)] or [""]
+        for piece in pieces:
+            # A change of unit (e.g. line -> page) starts a new chunk so every locator stays a single range.
+            if buffer and (size + len(piece) + 1 > chunk_size or unit_name != unit):
+                chunk = _flush()
+                if chunk is not None:
+                    yield chunk
+                buffer, size = [], 0
+            if not buffer:
+                unit, first = unit_name, index
+            buffer.append(piece)
+            size += len(piece) + 1
+            last = index
+    chunk = _flush()
+    if chunk is not None:
+        yield chunk
+
+
+def iter_source_chunks(text: str, chunk_size: int, label: Optional[str] = None) -> Iterator[SourceChunk]:
+    source_name, body = split_source_header(text)
+    yield from _pack_units(source_name, _text_units(body), chunk_size, label, content_key(text))
+
+
+def iter_chunks(texts: Iterable[str], chunk_size: int, label: Optional[str] = None) -> Iterator[SourceChunk]:
+    for text in texts:
+        for chunk in iter_source_chunks(text, chunk_size, label=label):
+            if chunk.text.strip():
+                yield chunk
+
+
+def chunk_sources(
+    source_texts: Sequence[str],
+    brownfield_texts: Sequence[str],
+    chunk_size: int,
+    max_chunks: int,
+) -> tuple[List[SourceChunk], Counter]:
+    # Inputs are chunked before brownfield docs so the cap drops brownfield context first.
+    def _all() -> Iterator[SourceChunk]:
+        yield from iter_chunks(source_texts, chunk_size)
+        yield from iter_chunks(brownfield_texts, chunk_size, label="brownfield")
+
+    stream = _all()
+    kept = list(islice(stream, max(1, max_chunks)))
+    # Per-source counts of chunks cut by the cap, so callers know which sources are incomplete.
+    dropped = Counter(chunk.source_key for chunk in stream)
+    return kept, dropped
@@ -12,4 +12,19 @@ class Settings:
     default_template_path: str = "R&D Analytics Finalised Requirements Document.pdf"
     default_chunk_size: int = 3000
     default_max_chunks: int = 40
+    default_max_concurrency: int = 4
+    default_loader_workers: int = 4
+    default_near_duplicate_threshold: float = 0.9
+    default_retrieval_top_k: int = 8
+    default_section_context_tokens: int = 3000
     default_output_dir: str = "brd_agent_2"
+    default_llm_cache_max_mb: int = 256
+    default_llm_cache_max_age_hours: float = 24 * 7
+    default_http_pool_size: int = 10
+    default_http_max_retries: int = 4
+    default_http_backoff_seconds: float = 1.0
+    default_max_in_flight: int = 8
+    default_batch_max_jobs: int = 4
+    default_max_gap_rounds: int = 3
+    default_context_tokens: int = 128000
+    default_tokenizer_encoding: str = "o200k_base"
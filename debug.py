@@ -1,17 +1,143 @@
 from __future__ import annotations
 
+import atexit
+import functools
+import hashlib
+import inspect
 import json
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
 
-from .models import BRDState
+from .models import BRDState, FactPack
+
+# "off" prints nothing, "summary" prints one line of sizes/counts/hashes per node,
+# "full" additionally queues the whole state to a JSONL file written by a background thread.
+TRACE_LEVELS = ("off", "summary", "full")
+
+_TRACE_LEVEL = "summary"
+_DUMP_PATH: Optional[Path] = None
+_DUMP_QUEUE: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+_DUMP_THREAD: Optional[threading.Thread] = None
+_DUMP_LOCK = threading.Lock()
+_NODE_STARTED: ContextVar[Optional[float]] = ContextVar("brd_node_started", default=None)
 
 
 def format_sources(texts: list[str]) -> str:
     return "\n\n".join(texts)
 
 
+def configure_tracing(level: str = "summary", dump_path: Optional[str] = None) -> None:
+    global _TRACE_LEVEL, _DUMP_PATH
+    if level not in TRACE_LEVELS:
+        raise ValueError(f"Unknown trace level: {level}")
+    close_trace()
+    _TRACE_LEVEL = level
+    _DUMP_PATH = Path(dump_path) if dump_path else None
+    if level == "full" and _DUMP_PATH is None:
+        raise ValueError("The 'full' trace level requires a dump path.")
+
+
+def traced(fn: Callable[[BRDState], Any]) -> Callable[[BRDState], Any]:
+    # Marks the node start so debug_state can report how long the node took.
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def _async_node(state: BRDState) -> Any:
+            token = _NODE_STARTED.set(time.perf_counter())
+            try:
+                return await fn(state)
+            finally:
+                _NODE_STARTED.reset(token)
+
+        return _async_node
+
+    @functools.wraps(fn)
+    def _node(state: BRDState) -> Any:
+        token = _NODE_STARTED.set(time.perf_counter())
+        try:
+            return fn(state)
+        finally:
+            _NODE_STARTED.reset(token)
+
+    return _node
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _fact_count(facts: FactPack) -> int:
+    return sum(len(getattr(facts, category)) for category in FactPack.model_fields)
+
+
+def state_summary(state: BRDState) -> Dict[str, Any]:
+    drafts = "\n".join(state.section_drafts)
+    return {
+        "sources": len(state.source_texts),
+        "source_chars": sum(len(t) for t in state.source_texts),
+        "brownfield": len(state.brownfield_texts),
+        "brownfield_chars": sum(len(t) for t in state.brownfield_texts),
+        "loaded_files": len(state.loaded_files),
+        "facts": _fact_count(state.facts),
+        "facts_hash": _digest(state.facts.model_dump_json()),
+        "fact_cache": len(state.fact_cache),
+        "gaps_blocking": len(state.gaps.blocking),
+        "gaps_non_blocking": len(state.gaps.non_blocking),
+        "outline_sections": len(state.outline.ordered_sections),
+        "drafts": sum(1 for d in state.section_drafts if d),
+        "draft_chars": len(drafts),
+        "drafts_hash": _digest(drafts),
+        "brd_chars": len(state.brd_markdown),
+        "brd_hash": _digest(state.brd_markdown),
+        "gap_rounds": state.gap_rounds,
+        "review_rounds": state.review_rounds,
+        "approved": state.approved,
+    }
+
+
+def _dump_worker(path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as handle:
+        while True:
+            record = _DUMP_QUEUE.get()
+            if record is None:
+                return
+            handle.write(json.dumps(record, default=str) + "\n")
+            handle.flush()
+
+
+def _enqueue_dump(record: Dict[str, Any]) -> None:
+    global _DUMP_THREAD
+    with _DUMP_LOCK:
+        if _DUMP_THREAD is None:
+            _DUMP_THREAD = threading.Thread(target=_dump_worker, args=(_DUMP_PATH,), name="brd-trace", daemon=True)
+            _DUMP_THREAD.start()
+    _DUMP_QUEUE.put(record)
+
+
+def close_trace() -> None:
+    global _DUMP_THREAD
+    with _DUMP_LOCK:
+        thread, _DUMP_THREAD = _DUMP_THREAD, None
+    if thread is not None:
+        _DUMP_QUEUE.put(None)
+        thread.join()
+
+
+atexit.register(close_trace)
+
+
 def debug_state(node_name: str, state: BRDState) -> None:
-    print(f"[debug] {node_name} state:")
-    try:
-        print(json.dumps(state.model_dump(), indent=2))
-    except Exception:
-        print(state)
+    if _TRACE_LEVEL == "off":
+        return
+    started = _NODE_STARTED.get()
+    summary = state_summary(state)
+    if started is not None:
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+    print(f"[trace] {node_name} {json.dumps(summary, separators=(',', ':'))}")
+    if _TRACE_LEVEL == "full":
+        # model_dump runs here so the snapshot cannot change under the writer; encoding and I/O happen off-thread.
+        _enqueue_dump({"node": node_name, "at": time.time(), "summary": summary, "state": state.model_dump()})
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .chunking import strip_locator_markers
+from .tokens import count_tokens
+
+# Word 5-grams and 64 permutations give a similarity estimate within about +/-0.06,
+# enough to tell a re-export of the same document from a related one.
+_SHINGLE_WORDS = 5
+_NUM_PERM = 64
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(_NUM_PERM)]
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class Duplicate:
+    path: str
+    duplicate_of: str
+    kind: str  # "file" | "content" | "near"
+    similarity: float
+    bytes: int
+    tokens: int
+
+    def describe(self) -> str:
+        if self.kind == "near":
+            return f"near-duplicate of {self.duplicate_of}, similarity={self.similarity:.2f}"
+        return f"{self.kind} duplicate of {self.duplicate_of}"
+
+
+@dataclass
+class DedupReport:
+    duplicates: List[Duplicate] = field(default_factory=list)
+
+    @property
+    def bytes_saved(self) -> int:
+        return sum(d.bytes for d in self.duplicates)
+
+    @property
+    def tokens_saved(self) -> int:
+        return sum(d.tokens for d in self.duplicates)
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def unique_files(paths: Sequence[Path]) -> Tuple[List[Path], Dict[Path, Path]]:
+    # Byte-identical copies are dropped before extraction. Only files that share a size are hashed.
+    by_size: Dict[int, List[Path]] = {}
+    for path in paths:
+        by_size.setdefault(path.stat().st_size, []).append(path)
+    copies: Dict[Path, Path] = {}
+    for group in by_size.values():
+        if len(group) < 2:
+            continue
+        first_seen: Dict[str, Path] = {}
+        for path in group:
+            original = first_seen.setdefault(_file_digest(path), path)
+            if original is not path:
+                copies[path] = original
+    return [p for p in paths if p not in copies], copies
+
+
+def _words(text: str) -> List[str]:
+    # Locator markers are not content: a DOCX and a TXT of the same text must produce the same words.
+    return _WORD.findall(strip_locator_markers(text).lower())
+
+
+def _content_digest(words: List[str]) -> str:
+    # Case, punctuation and whitespace are ignored, so a re-wrapped copy still matches exactly.
+    return hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest()
+
+
+def _shingles(words: List[str]) -> set[int]:
+    size = min(_SHINGLE_WORDS, len(words)) or 1
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + size]).encode("utf-8"), digest_size=8).digest(), "big")
+        for i in range(max(1, len(words) - size + 1))
+    }
+
+
+def minhash_signature(shingles: set[int]) -> Tuple[int, ...]:
+    return tuple(min((a * s + b) % _PRIME for s in shingles) for a, b in _PERMUTATIONS)
+
+
+def estimate_similarity(left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+@dataclass
+class _Entry:
+    name: str
+    shingle_count: int
+    signature: Tuple[int, ...]
+
+
+class ContentIndex:
+    """Exact and near-duplicate lookup over the texts loaded so far in a run."""
+
+    def __init__(self, threshold: float) -> None:
+        # A threshold of 1.0 or more turns near-duplicate detection off; exact matches are always caught.
+        self.threshold = threshold
+        self._hashes: Dict[str, str] = {}
+        self._entries: List[_Entry] = []
+
+    def match(self, name: str, text: str) -> Optional[Tuple[str, str, float]]:
+        """Return (original name, kind, similarity) if text duplicates an indexed text, else index it."""
+        words = _words(text)
+        digest = _content_digest(words)
+        if digest in self._hashes:
+            return self._hashes[digest], "content", 1.0
+        if self.threshold >= 1.0 or not words:
+            self._hashes[digest] = name
+            return None
+        shingles = _shingles(words)
+        signature = minhash_signature(shingles)
+        for entry in self._entries:
+            # Jaccard similarity cannot exceed the size ratio of the two shingle sets.
+            small, large = sorted((entry.shingle_count, len(shingles)))
+            if small / large < self.threshold:
+                continue
+            similarity = estimate_similarity(signature, entry.signature)
+            if similarity >= self.threshold:
+                self._hashes[digest] = entry.name
+                return entry.name, "near", similarity
+        self._hashes[digest] = name
+        self._entries.append(_Entry(name, len(shingles), signature))
+        return None
+
+
+def duplicate_record(path: str, original: str, kind: str, similarity: float, text: str) -> Duplicate:
+    return Duplicate(path, original, kind, round(similarity, 3), len(text.encode("utf-8")), count_tokens(text))
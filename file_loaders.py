@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+import hashlib
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, Sequence
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
 
 from pypdf import PdfReader
 
 from .config import SUPPORTED_EXTENSIONS
 
+# Formats whose extraction is CPU-bound and worth shipping to a worker process.
+HEAVY_EXTENSIONS = {".pdf", ".pptx", ".docx"}
+# Bumped whenever the extracted-text format changes so stale cache entries are ignored.
+_EXTRACT_CACHE_VERSION = 3
+
 try:
     from pptx import Presentation
 except Exception:
@@ -18,31 +29,61 @@ except Exception:
     Document = None
 
 
-def read_pdf_text(path: Path) -> str:
+@dataclass(frozen=True)
+class TextSegment:
+    source: str
+    unit: str  # "page" | "slide" | "paragraph"
+    index: int
+    text: str
+
+    @property
+    def locator(self) -> str:
+        return f"{self.unit} {self.index}"
+
+
+def locator_marker(segment: TextSegment) -> str:
+    return f"[[{segment.unit} {segment.index}]]"
+
+
+def iter_pdf_segments(path: Path) -> Iterator[TextSegment]:
     reader = PdfReader(str(path))
-    parts = []
-    for page in reader.pages:
-        parts.append(page.extract_text() or "")
-    return "\n".join(parts)
+    for number, page in enumerate(reader.pages, start=1):
+        yield TextSegment(path.name, "page", number, page.extract_text() or "")
 
 
-def read_pptx_text(path: Path) -> str:
+def iter_pptx_segments(path: Path) -> Iterator[TextSegment]:
     if Presentation is None:
-        return ""
+        return
     pres = Presentation(str(path))
-    parts = []
-    for slide in pres.slides:
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                parts.append(shape.text)
-    return "\n".join(parts)
+    for number, slide in enumerate(pres.slides, start=1):
+        parts = [shape.text for shape in slide.shapes if hasattr(shape, "text")]
+        yield TextSegment(path.name, "slide", number, "\n".join(parts))
 
 
-def read_docx_text(path: Path) -> str:
+def iter_docx_segments(path: Path) -> Iterator[TextSegment]:
     if Document is None:
-        return ""
+        return
     doc = Document(str(path))
-    return "\n".join(p.text for p in doc.paragraphs if p.text)
+    for number, paragraph in enumerate(doc.paragraphs, start=1):
+        if paragraph.text:
+            yield TextSegment(path.name, "paragraph", number, paragraph.text)
+
+
+def _join_marked(segments: Iterable[TextSegment]) -> str:
+    # Page/slide/paragraph markers survive into source_texts so chunk locators and citations stay real.
+    return "\n".join(f"{locator_marker(segment)}\n{segment.text}" for segment in segments)
+
+
+def read_pdf_text(path: Path) -> str:
+    return _join_marked(iter_pdf_segments(path))
+
+
+def read_pptx_text(path: Path) -> str:
+    return _join_marked(iter_pptx_segments(path))
+
+
+def read_docx_text(path: Path) -> str:
+    return _join_marked(iter_docx_segments(path))
 
 
 def load_source_text(path: Path) -> str:
@@ -67,3 +108,101 @@ def iter_input_files(paths: Sequence[str]) -> Iterable[Path]:
             for file_path in path.rglob("*"):
                 if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
                     yield file_path
+
+
+@dataclass
+class LoadResult:
+    path: Path
+    text: Optional[str]
+    seconds: float
+    cached: bool = False
+    error: Optional[str] = None
+    bytes: int = 0
+
+
+def _cache_file(cache_dir: Path, path: Path) -> Path:
+    stat = path.stat()
+    key = f"v{_EXTRACT_CACHE_VERSION}|{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+    return cache_dir / (hashlib.sha256(key.encode("utf-8")).hexdigest() + ".txt")
+
+
+def _read_cached(cache_dir: Optional[Path], path: Path) -> Optional[str]:
+    if cache_dir is None:
+        return None
+    try:
+        return _cache_file(cache_dir, path).read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+
+def _write_cached(cache_dir: Optional[Path], path: Path, text: str) -> None:
+    if cache_dir is None:
+        return
+    target = _cache_file(cache_dir, path)
+    tmp = target.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        tmp.write_text(text, encoding="utf-8")
+        tmp.replace(target)
+    except OSError as exc:
+        print(f"[warn] could not cache extracted text for {path.name}: {exc}")
+
+
+def _extract(path_str: str) -> LoadResult:
+    path = Path(path_str)
+    started = time.perf_counter()
+    try:
+        text = load_source_text(path)
+    except Exception as exc:
+        return LoadResult(path, None, time.perf_counter() - started, error=f"{type(exc).__name__}: {exc}")
+    return LoadResult(path, text, time.perf_counter() - started, bytes=path.stat().st_size)
+
+
+def _report(done: int, total: int, result: LoadResult) -> None:
+    status = "cached" if result.cached else ("failed" if result.error else "extracted")
+    print(f"[load] {done}/{total} {result.path.name} {result.seconds:.2f}s ({status})")
+
+
+def load_source_texts(
+    paths: Sequence[Path],
+    workers: int = 0,
+    cache_dir: Optional[str] = None,
+) -> List[LoadResult]:
+    cache_root = Path(cache_dir) if cache_dir else None
+    if cache_root is not None:
+        cache_root.mkdir(parents=True, exist_ok=True)
+
+    results: Dict[int, LoadResult] = {}
+    heavy: List[int] = []
+    for i, path in enumerate(paths):
+        started = time.perf_counter()
+        cached = _read_cached(cache_root, path)
+        if cached is not None:
+            # bytes is the input file's size either way, so bytes_loaded does not change between cold and warm runs.
+            results[i] = LoadResult(
+                path, cached, time.perf_counter() - started, cached=True, bytes=path.stat().st_size
+            )
+        elif path.suffix.lower() in HEAVY_EXTENSIONS and workers > 1:
+            heavy.append(i)
+            continue
+        else:
+            results[i] = _extract(str(path))
+        _report(len(results), len(paths), results[i])
+
+    if heavy:
+        # Loaded from inside a graph node, where HTTP pools and executor threads already exist; forking a
+        # multithreaded process can deadlock the child, so workers are spawned fresh.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(workers, len(heavy)), mp_context=context) as pool:
+            futures = {pool.submit(_extract, str(paths[i])): i for i in heavy}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                _report(len(results), len(paths), results[i])
+
+    ordered = [results[i] for i in range(len(paths))]
+    for result in ordered:
+        if result.text is not None and not result.cached:
+            _write_cached(cache_root, result.path, result.text)
+        if result.error:
+            print(f"[warn] failed to load {result.path.name}: {result.error}")
+    return ordered
@@ -1,62 +1,109 @@
 from __future__ import annotations
 
+from typing import Callable, Dict, List, Tuple, Union
+
 from langgraph.graph import END, StateGraph
 
+from .budget import budgeted
+from .checkpoints import checkpointed
+from .debug import traced
+from .metrics import instrumented
 from .models import BRDState
-from .nodes.assembly_nodes import assembler_node, persist_doc_node
-from .nodes.fact_nodes import fact_extractor_node
-from .nodes.gap_nodes import gap_checker_node, gap_human_review_node
-from .nodes.intake_nodes import intake_node, load_sources_node
-from .nodes.outline_nodes import outline_builder_node
-from .nodes.review_nodes import apply_feedback_node, human_review_node
-from .nodes.section_nodes import section_writer_node
+from .nodes.assembly_nodes import aassembler_node, assembler_node, persist_doc_node
+from .nodes.fact_nodes import afact_extractor_node, fact_extractor_node
+from .nodes.gap_nodes import agap_checker_node, gap_checker_node, gap_human_review_node
+from .nodes.intake_nodes import aintake_node, intake_node, load_sources_node
+from .nodes.outline_nodes import aoutline_builder_node, outline_builder_node
+from .nodes.review_nodes import aapply_feedback_node, apply_feedback_node, human_review_node
+from .nodes.section_nodes import asection_writer_node, section_writer_node
+
+
+def sources_branch(state: BRDState) -> Union[str, List[str]]:
+    # Intake and fact extraction only read the sources, so the first pass runs them as parallel branches.
+    # Intake runs once; later passes through load_sources come from the gap loop.
+    if state.intake is None:
+        return ["intake", "fact_extractor"]
+    # Nothing new was loaded: the previous FactPack and GapReport still hold, so go straight back to review.
+    if state.gaps_inputs_key == state.inputs_key():
+        return "gap_human_review"
+    return "fact_extractor"
+
+
+def gap_branch(state: BRDState) -> str:
+    has_gaps = bool(state.gaps.blocking or state.gaps.non_blocking)
+    if not has_gaps or state.user_force_generate:
+        # Drafts written speculatively during gap review are already in the state.
+        return "assembler" if state.speculated else "outline_builder"
+    return END if state.stop_reason else "load_sources"
+
+
+def review_branch(state: BRDState) -> str:
+    return "persist_doc" if state.approved else "apply_feedback"
+
+
+def feedback_branch(state: BRDState) -> str:
+    # Section-targeted feedback skips the outline and rewrites only those sections.
+    return "section_writer" if state.section_feedback else "outline_builder"
 
 
-def build_graph() -> StateGraph:
+# The routing table is shared by build_graph and next_node, so a resumed run follows the same edges.
+_EDGES: Dict[str, str] = {
+    # Both branches feed gap_checker, which runs once after the step in which they finish.
+    "intake": "gap_checker",
+    "fact_extractor": "gap_checker",
+    "gap_checker": "gap_human_review",
+    "outline_builder": "section_writer",
+    "section_writer": "assembler",
+    "assembler": "human_review",
+    "persist_doc": END,
+}
+_BRANCHES: Dict[str, Tuple[Callable[[BRDState], Union[str, List[str]]], Tuple[str, ...]]] = {
+    "load_sources": (sources_branch, ("intake", "fact_extractor", "gap_human_review")),
+    "gap_human_review": (gap_branch, ("outline_builder", "assembler", "load_sources", END)),
+    "human_review": (review_branch, ("persist_doc", "apply_feedback")),
+    "apply_feedback": (feedback_branch, ("section_writer", "outline_builder")),
+}
+# Nodes that never call the model are not stopped by the token budget (e.g. the finished BRD is still saved).
+_MODEL_FREE_NODES = {"load_sources", "gap_human_review", "human_review", "persist_doc"}
+
+
+def next_node(completed: str, state: BRDState) -> str:
+    if completed in _EDGES:
+        return _EDGES[completed]
+    target = _BRANCHES[completed][0](state)
+    # A fan-out has no single entry node, so the node that fans out runs again (load_sources re-reads the inputs).
+    return completed if isinstance(target, list) else target
+
+
+def build_graph(use_async: bool = False, entry: str = "load_sources") -> StateGraph:
+    # Async graphs must be driven with ainvoke; non-LLM nodes stay synchronous either way.
     graph = StateGraph(BRDState)
-    graph.add_node("load_sources", load_sources_node)
-    graph.add_node("intake", intake_node)
-    graph.add_node("fact_extractor", fact_extractor_node)
-    graph.add_node("gap_checker", gap_checker_node)
-    graph.add_node("gap_human_review", gap_human_review_node)
-    graph.add_node("outline_builder", outline_builder_node)
-    graph.add_node("section_writer", section_writer_node)
-    graph.add_node("assembler", assembler_node)
-    graph.add_node("human_review", human_review_node)
-    graph.add_node("persist_doc", persist_doc_node)
-    graph.add_node("apply_feedback", apply_feedback_node)
-
-    graph.set_entry_point("load_sources")
-    graph.add_edge("load_sources", "intake")
-    graph.add_edge("intake", "fact_extractor")
-    graph.add_edge("fact_extractor", "gap_checker")
-    graph.add_edge("gap_checker", "gap_human_review")
-
-    def gap_branch(state: BRDState) -> str:
-        has_gaps = bool(state.gaps.blocking or state.gaps.non_blocking)
-        if not has_gaps:
-            return "outline_builder"
-        return "outline_builder" if state.user_force_generate else "fact_extractor"
-
-    graph.add_conditional_edges(
-        "gap_human_review",
-        gap_branch,
-        {"outline_builder": "outline_builder", "fact_extractor": "fact_extractor"},
-    )
-
-    graph.add_edge("outline_builder", "section_writer")
-    graph.add_edge("section_writer", "assembler")
-    graph.add_edge("assembler", "human_review")
-
-    def review_branch(state: BRDState) -> str:
-        return "persist_doc" if state.approved else "apply_feedback"
-
-    graph.add_conditional_edges(
-        "human_review",
-        review_branch,
-        {"persist_doc": "persist_doc", "apply_feedback": "apply_feedback"},
-    )
-    graph.add_edge("apply_feedback", "outline_builder")
-    graph.add_edge("persist_doc", END)
+
+    def add_node(name: str, fn) -> None:
+        # Every node is timed for the run report and for its trace line; LLM calls inside are attributed to it.
+        # Checkpoints are written after the node returns (a no-op unless checkpointing is configured),
+        # so they include the tokens the node charged against the run's budget.
+        node = budgeted(name, fn, enforce=name not in _MODEL_FREE_NODES)
+        graph.add_node(name, traced(instrumented(name, checkpointed(name, node))))
+
+    add_node("load_sources", load_sources_node)
+    add_node("intake", aintake_node if use_async else intake_node)
+    add_node("fact_extractor", afact_extractor_node if use_async else fact_extractor_node)
+    add_node("gap_checker", agap_checker_node if use_async else gap_checker_node)
+    add_node("gap_human_review", gap_human_review_node)
+    add_node("outline_builder", aoutline_builder_node if use_async else outline_builder_node)
+    add_node("section_writer", asection_writer_node if use_async else section_writer_node)
+    add_node("assembler", aassembler_node if use_async else assembler_node)
+    add_node("human_review", human_review_node)
+    add_node("persist_doc", persist_doc_node)
+    add_node("apply_feedback", aapply_feedback_node if use_async else apply_feedback_node)
+
+    # Resumed runs enter at the first node that had not finished when the run stopped.
+    graph.set_entry_point(entry)
+
+    for source, target in _EDGES.items():
+        graph.add_edge(source, target)
+    for source, (branch, targets) in _BRANCHES.items():
+        graph.add_conditional_edges(source, branch, {target: target for target in targets})
 
     return graph
@@ -1,80 +1,665 @@
 from __future__ import annotations
 
 import ast
+import asyncio
 import json
 import os
+import random
 import re
-from typing import Any, Dict, Mapping, Type
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Type, TypeVar
 
 import requests
 from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+from .llm_cache import ResponseCache
+from .metrics import record_llm_call, record_retry
+from .tokens import check_prompt, count_tokens
+
+try:
+    import httpx
+except Exception:
+    httpx = None
+
+DEFAULT_AUTH_BASE_URL = "https://daia.privatelink.azurewebsites.net/authentication-service/api/v1/auth"
+DEFAULT_MODEL_BASE_URL = "https://daia.privatelink.azurewebsites.net/model-as-a-service"
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
 
 _CACHED_TOKEN: str | None = None
+_TOKEN_LOCK = threading.Lock()
+_SESSION: requests.Session | None = None
+_SESSION_LOCK = threading.Lock()
+_HTTP_POOL_SIZE = 10
+_HTTP_MAX_RETRIES = 4
+_HTTP_BACKOFF_SECONDS = 1.0
+_HTTP_BACKOFF_MAX_SECONDS = 30.0
+_ASYNC_MAX_IN_FLIGHT = 8
+# One AsyncClient and in-flight semaphore per event loop; both are bound to the loop that created them.
+_ASYNC_RESOURCES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple[Any, asyncio.Semaphore]]" = (
+    weakref.WeakKeyDictionary()
+)
+_RESPONSE_CACHE: ResponseCache | None = None
+_CACHE_BYPASS = False
 
+DeltaCallback = Callable[[str], None]
+
+
+@dataclass
+class UsageTotals:
+    calls: int = 0
+    cache_hits: int = 0
+    reported_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @property
+    def billed_tokens(self) -> int:
+        return self.total_tokens - self.cached_tokens
+
+    def add(self, usage: dict, cached: bool) -> None:
+        with self._lock:
+            self.calls += 1
+            self.cache_hits += int(cached)
+            self.reported_calls += int(usage.get("reported", False))
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.completion_tokens += usage["completion_tokens"]
+            if cached:
+                self.cached_tokens += usage["prompt_tokens"] + usage["completion_tokens"]
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "cache_hits": self.cache_hits,
+            "reported_calls": self.reported_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "cached_tokens": self.cached_tokens,
+        }
+
+
+_USAGE: ContextVar[Tuple[UsageTotals, ...]] = ContextVar("brd_llm_usage", default=())
+
+
+@contextmanager
+def track_usage() -> Iterator[UsageTotals]:
+    # Trackers nest: a call counts toward every enclosing tracker (e.g. a batch job and the node inside it).
+    totals = UsageTotals()
+    token = _USAGE.set(_USAGE.get() + (totals,))
+    try:
+        yield totals
+    finally:
+        _USAGE.reset(token)
+
+
+def _record_usage(usage: dict, cached: bool, started: float) -> None:
+    usage["latency_seconds"] = round(time.perf_counter() - started, 3)
+    for totals in _USAGE.get():
+        totals.add(usage, cached)
+    record_llm_call(usage, cached)
+
+
+def thread_map(fn: Callable[[_T], _R], items: Iterable[_T], max_workers: int) -> List[_R]:
+    # Each task runs in a copy of the caller's context so usage tracking follows it into the pool.
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        futures = [pool.submit(copy_context().run, fn, item) for item in items]
+        return [future.result() for future in futures]
+
+
+def configure_response_cache(
+    path: str | None,
+    max_bytes: int = 256 * 1024 * 1024,
+    max_age_seconds: float = 7 * 24 * 3600,
+    bypass: bool = False,
+) -> ResponseCache | None:
+    global _RESPONSE_CACHE, _CACHE_BYPASS
+    if _RESPONSE_CACHE is not None:
+        _RESPONSE_CACHE.close()
+    _RESPONSE_CACHE = ResponseCache(path, max_bytes, max_age_seconds) if path else None
+    _CACHE_BYPASS = bypass
+    return _RESPONSE_CACHE
+
+
+def response_cache_stats() -> Dict[str, int]:
+    if _RESPONSE_CACHE is None:
+        return {}
+    return _RESPONSE_CACHE.stats()
+
+
+def configure_http(
+    pool_size: int = 10,
+    max_retries: int = 4,
+    backoff_seconds: float = 1.0,
+    backoff_max_seconds: float = 30.0,
+) -> None:
+    global _SESSION, _HTTP_POOL_SIZE, _HTTP_MAX_RETRIES, _HTTP_BACKOFF_SECONDS, _HTTP_BACKOFF_MAX_SECONDS
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
+        _HTTP_POOL_SIZE = max(1, pool_size)
+        _HTTP_MAX_RETRIES = max(0, max_retries)
+        _HTTP_BACKOFF_SECONDS = backoff_seconds
+        _HTTP_BACKOFF_MAX_SECONDS = backoff_max_seconds
+
+
+def _get_session() -> requests.Session:
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=_HTTP_POOL_SIZE, pool_maxsize=_HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.verify = False
+            _SESSION = session
+        return _SESSION
 
-def _get_token() -> str:
-    global _CACHED_TOKEN
-    if _CACHED_TOKEN:
-        return _CACHED_TOKEN
 
+def _backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    # Full jitter keeps concurrent section writers from retrying in lockstep.
+    delay = random.uniform(0, min(_HTTP_BACKOFF_MAX_SECONDS, _HTTP_BACKOFF_SECONDS * (2 ** attempt)))
+    if retry_after:
+        try:
+            delay = max(delay, min(_HTTP_BACKOFF_MAX_SECONDS, float(retry_after)))
+        except ValueError:
+            pass
+    return delay
+
+
+def _post_with_retries(
+    url: str,
+    payload: Dict[str, Any],
+    timeout: float,
+    headers: Optional[Dict[str, str]] = None,
+    stream: bool = False,
+) -> requests.Response:
+    session = _get_session()
+    attempt = 0
+    while True:
+        try:
+            response = session.post(url, json=payload, headers=headers, timeout=timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            if attempt >= _HTTP_MAX_RETRIES:
+                raise
+            reason = type(exc).__name__
+            delay = _backoff_delay(attempt)
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= _HTTP_MAX_RETRIES:
+                return response
+            reason = f"HTTP {response.status_code}"
+            delay = _backoff_delay(attempt, response.headers.get("Retry-After"))
+            response.close()
+        attempt += 1
+        record_retry()
+        print(f"[warn] POST {url} failed ({reason}); retry {attempt}/{_HTTP_MAX_RETRIES} in {delay:.1f}s")
+        time.sleep(delay)
+
+
+def _auth_base_url() -> str:
+    return os.getenv("AUTH_SERVICE_BASE_URL", DEFAULT_AUTH_BASE_URL).rstrip("/")
+
+
+def _model_base_url() -> str:
+    return os.getenv("MODEL_AS_A_SERVICE_BASE_URL", DEFAULT_MODEL_BASE_URL).rstrip("/")
+
+
+def _fetch_token() -> str:
     client_id = os.getenv("CLIENT_ID")
     client_secret = os.getenv("CLIENT_SECRET")
     if not client_id or not client_secret:
         raise EnvironmentError("CLIENT_ID and CLIENT_SECRET are required to generate the access token.")
 
-    auth_base_url = "https://daia.privatelink.azurewebsites.net/authentication-service/api/v1/auth"
     path = "/generate-token"
     input_data = {"client_id": client_id, "client_secret": client_secret}
-    response = requests.post(auth_base_url + path, json=input_data, verify=False, timeout=30)
+    response = _post_with_retries(_auth_base_url() + path, input_data, timeout=30)
     response.raise_for_status()
     token = response.json().get("token")
     if not token:
         raise RuntimeError("Token not found in authentication response.")
-    _CACHED_TOKEN = token
     return token
 
 
-def generate_text(prompt: str, max_tokens: int = 1200) -> str:
-    model_base_url = "https://daia.privatelink.azurewebsites.net/model-as-a-service"
-    path = "/chat/completions"
-    model = os.getenv("MODEL_AS_A_SERVICE_MODEL", "gpt-5")
-    headers = {"Authorization": f"Bearer {_get_token()}"}
-    input_data: Dict[str, Any] = {
+def _get_token() -> str:
+    global _CACHED_TOKEN
+    with _TOKEN_LOCK:
+        if not _CACHED_TOKEN:
+            _CACHED_TOKEN = _fetch_token()
+        return _CACHED_TOKEN
+
+
+def _refresh_token(stale_token: str) -> str:
+    global _CACHED_TOKEN
+    with _TOKEN_LOCK:
+        # Another thread may already have replaced the token that was rejected.
+        if _CACHED_TOKEN == stale_token or not _CACHED_TOKEN:
+            _CACHED_TOKEN = _fetch_token()
+        return _CACHED_TOKEN
+
+
+def configure_async(max_in_flight: int = 8) -> None:
+    global _ASYNC_MAX_IN_FLIGHT
+    _ASYNC_MAX_IN_FLIGHT = max(1, max_in_flight)
+
+
+def _async_resources() -> tuple[Any, asyncio.Semaphore]:
+    if httpx is None:
+        raise RuntimeError("httpx is required for async generation.")
+    loop = asyncio.get_running_loop()
+    resources = _ASYNC_RESOURCES.get(loop)
+    if resources is None:
+        client = httpx.AsyncClient(
+            verify=False,
+            timeout=httpx.Timeout(60.0, pool=None),
+            limits=httpx.Limits(
+                max_connections=_HTTP_POOL_SIZE,
+                max_keepalive_connections=_HTTP_POOL_SIZE,
+            ),
+        )
+        resources = (client, asyncio.Semaphore(_ASYNC_MAX_IN_FLIGHT))
+        _ASYNC_RESOURCES[loop] = resources
+    return resources
+
+
+async def aclose_async_client() -> None:
+    resources = _ASYNC_RESOURCES.pop(asyncio.get_running_loop(), None)
+    if resources is not None:
+        await resources[0].aclose()
+
+
+async def _apost_with_retries(
+    url: str,
+    payload: Dict[str, Any],
+    timeout: float,
+    headers: Optional[Dict[str, str]] = None,
+    stream: bool = False,
+) -> Any:
+    client, semaphore = _async_resources()
+    attempt = 0
+    while True:
+        try:
+            if stream:
+                # Streaming callers hold a semaphore slot themselves until the body is consumed.
+                request = client.build_request("POST", url, json=payload, headers=headers, timeout=timeout)
+                response = await client.send(request, stream=True)
+            else:
+                # The semaphore caps in-flight requests across every coroutine on this loop.
+                async with semaphore:
+                    response = await client.post(url, json=payload, headers=headers, timeout=timeout)
+        except httpx.TransportError as exc:
+            if attempt >= _HTTP_MAX_RETRIES:
+                raise
+            reason = type(exc).__name__
+            delay = _backoff_delay(attempt)
+        else:
+            if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= _HTTP_MAX_RETRIES:
+                return response
+            reason = f"HTTP {response.status_code}"
+            delay = _backoff_delay(attempt, response.headers.get("Retry-After"))
+            await response.aclose()
+        attempt += 1
+        record_retry()
+        print(f"[warn] POST {url} failed ({reason}); retry {attempt}/{_HTTP_MAX_RETRIES} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+def _completion_payload(model: str, prompt: str, max_tokens: int) -> Dict[str, Any]:
+    return {
         "model": model,
         "messages": [{"role": "user", "content": prompt}],
         "max_tokens": max_tokens,
     }
-    response = requests.post(
-        model_base_url + path,
-        json=input_data,
-        headers=headers,
-        verify=False,
-        timeout=60,
-    )
-    response.raise_for_status()
-    data = response.json()
+
+
+def _completion_content(data: Dict[str, Any]) -> str:
     try:
         return data["choices"][0]["message"]["content"]
     except Exception as exc:
         raise RuntimeError(f"Unexpected response format: {data}") from exc
 
 
+def _cached_completion(model: str, prompt: str, max_tokens: int, use_cache: bool) -> tuple[Optional[str], str]:
+    if _RESPONSE_CACHE is None or not use_cache:
+        return None, ""
+    cache_key = ResponseCache.make_key(model, prompt, max_tokens)
+    if _CACHE_BYPASS:
+        return None, cache_key
+    return _RESPONSE_CACHE.get(cache_key), cache_key
+
+
+def _store_completion(cache_key: str, model: str, max_tokens: int, content: str) -> None:
+    # Empty completions trigger a retry in the nodes, so they must never be replayed from cache.
+    if _RESPONSE_CACHE is not None and cache_key and content.strip():
+        _RESPONSE_CACHE.put(cache_key, model, max_tokens, content)
+
+
+def _generate(prompt: str, max_tokens: int, use_cache: bool) -> tuple[str, dict]:
+    started = time.perf_counter()
+    model = os.getenv("MODEL_AS_A_SERVICE_MODEL", "gpt-5")
+    cached, cache_key = _cached_completion(model, prompt, max_tokens, use_cache)
+    if cached is not None:
+        usage = _usage(prompt, cached)
+        _record_usage(usage, cached=True, started=started)
+        return cached, usage
+    # Oversized prompts fail here instead of after a round-trip to the model service.
+    check_prompt(prompt, max_tokens)
+    content, reported = _request_completion(model, prompt, max_tokens)
+    _store_completion(cache_key, model, max_tokens, content)
+    usage = _usage(prompt, content, reported)
+    _record_usage(usage, cached=False, started=started)
+    return content, usage
+
+
+async def _agenerate(prompt: str, max_tokens: int, use_cache: bool) -> tuple[str, dict]:
+    started = time.perf_counter()
+    model = os.getenv("MODEL_AS_A_SERVICE_MODEL", "gpt-5")
+    cached, cache_key = _cached_completion(model, prompt, max_tokens, use_cache)
+    if cached is not None:
+        usage = _usage(prompt, cached)
+        _record_usage(usage, cached=True, started=started)
+        return cached, usage
+    check_prompt(prompt, max_tokens)
+    content, reported = await _arequest_completion(model, prompt, max_tokens)
+    _store_completion(cache_key, model, max_tokens, content)
+    usage = _usage(prompt, content, reported)
+    _record_usage(usage, cached=False, started=started)
+    return content, usage
+
+
+def generate_text(prompt: str, max_tokens: int = 1200, use_cache: bool = True) -> str:
+    return _generate(prompt, max_tokens, use_cache)[0]
+
+
+async def agenerate_text(prompt: str, max_tokens: int = 1200, use_cache: bool = True) -> str:
+    return (await _agenerate(prompt, max_tokens, use_cache))[0]
+
+
+def _request_completion(model: str, prompt: str, max_tokens: int) -> tuple[str, Optional[dict]]:
+    url = _model_base_url() + "/chat/completions"
+    input_data = _completion_payload(model, prompt, max_tokens)
+    token = _get_token()
+    response = _post_with_retries(url, input_data, timeout=60, headers={"Authorization": f"Bearer {token}"})
+    if response.status_code == 401:
+        response.close()
+        token = _refresh_token(token)
+        response = _post_with_retries(url, input_data, timeout=60, headers={"Authorization": f"Bearer {token}"})
+    response.raise_for_status()
+    data = response.json()
+    return _completion_content(data), _reported_usage(data)
+
+
+async def _arequest_completion(model: str, prompt: str, max_tokens: int) -> tuple[str, Optional[dict]]:
+    url = _model_base_url() + "/chat/completions"
+    input_data = _completion_payload(model, prompt, max_tokens)
+    # Token fetches are rare and lock-protected, so the blocking client is reused in a worker thread.
+    token = await asyncio.to_thread(_get_token)
+    response = await _apost_with_retries(url, input_data, timeout=60, headers={"Authorization": f"Bearer {token}"})
+    if response.status_code == 401:
+        token = await asyncio.to_thread(_refresh_token, token)
+        response = await _apost_with_retries(url, input_data, timeout=60, headers={"Authorization": f"Bearer {token}"})
+    response.raise_for_status()
+    data = response.json()
+    return _completion_content(data), _reported_usage(data)
+
+
 def estimate_tokens(text: str) -> int:
-    if not text:
-        return 0
-    return max(1, len(text) // 4)
+    return count_tokens(text)
 
 
-def generate_text_with_usage(prompt: str, max_tokens: int = 1200) -> tuple[str, dict]:
-    response = generate_text(prompt, max_tokens=max_tokens)
-    prompt_tokens = estimate_tokens(prompt)
-    completion_tokens = estimate_tokens(response)
-    usage = {
+def _reported_usage(data: Dict[str, Any]) -> Optional[dict]:
+    usage = data.get("usage") or {}
+    try:
+        return {
+            "prompt_tokens": int(usage["prompt_tokens"]),
+            "completion_tokens": int(usage["completion_tokens"]),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _usage(prompt: str, response: str, reported: Optional[dict] = None) -> dict:
+    # Server-reported counts win; the local tokenizer covers cache hits and services that omit usage.
+    if reported is not None:
+        prompt_tokens = reported["prompt_tokens"]
+        completion_tokens = reported["completion_tokens"]
+    else:
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(response)
+    return {
         "prompt_tokens": prompt_tokens,
         "completion_tokens": completion_tokens,
         "total_tokens": prompt_tokens + completion_tokens,
+        "reported": reported is not None,
     }
-    return response, usage
+
+
+def generate_text_with_usage(prompt: str, max_tokens: int = 1200, use_cache: bool = True) -> tuple[str, dict]:
+    return _generate(prompt, max_tokens, use_cache)
+
+
+async def agenerate_text_with_usage(prompt: str, max_tokens: int = 1200, use_cache: bool = True) -> tuple[str, dict]:
+    return await _agenerate(prompt, max_tokens, use_cache)
+
+
+class _StreamCollector:
+    # Accumulates SSE deltas and times the first token for TTFT / tokens-per-second.
+    def __init__(self, prompt: str, on_delta: Optional[DeltaCallback]) -> None:
+        self.prompt = prompt
+        self.on_delta = on_delta
+        self.parts: List[str] = []
+        self.reported: Optional[dict] = None
+        self.started = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+
+    def add(self, delta: str) -> None:
+        if not delta:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.parts.append(delta)
+        if self.on_delta is not None:
+            self.on_delta(delta)
+
+    def feed(self, line: str) -> None:
+        if not line or not line.startswith("data:"):
+            return
+        data = line[5:].strip()
+        if not data or data == "[DONE]":
+            return
+        event = json.loads(data)
+        if event.get("usage"):
+            self.reported = _reported_usage(event)
+        choices = event.get("choices") or []
+        if choices:
+            self.add((choices[0].get("delta") or {}).get("content") or "")
+
+    def finish(self) -> tuple[str, dict]:
+        content = "".join(self.parts)
+        finished = time.perf_counter()
+        usage = _usage(self.prompt, content, self.reported)
+        first = self.first_token_at if self.first_token_at is not None else finished
+        usage["ttft_seconds"] = round(first - self.started, 3)
+        usage["tokens_per_second"] = round(usage["completion_tokens"] / max(finished - first, 1e-6), 1)
+        return content, usage
+
+
+def _stream_payload(model: str, prompt: str, max_tokens: int) -> Dict[str, Any]:
+    payload = _completion_payload(model, prompt, max_tokens)
+    payload["stream"] = True
+    payload["stream_options"] = {"include_usage": True}
+    return payload
+
+
+def _is_event_stream(response: Any) -> bool:
+    return "text/event-stream" in response.headers.get("Content-Type", "")
+
+
+def _stream_completion(model: str, prompt: str, max_tokens: int, on_delta: Optional[DeltaCallback]) -> tuple[str, dict]:
+    url = _model_base_url() + "/chat/completions"
+    input_data = _stream_payload(model, prompt, max_tokens)
+    token = _get_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    response = _post_with_retries(url, input_data, timeout=60, headers=headers, stream=True)
+    if response.status_code == 401:
+        response.close()
+        token = _refresh_token(token)
+        headers = {"Authorization": f"Bearer {token}"}
+        response = _post_with_retries(url, input_data, timeout=60, headers=headers, stream=True)
+    collector = _StreamCollector(prompt, on_delta)
+    with response:
+        response.raise_for_status()
+        if not _is_event_stream(response):
+            # Services that ignore "stream" answer with one JSON body; it arrives as a single delta.
+            data = response.json()
+            collector.reported = _reported_usage(data)
+            collector.add(_completion_content(data))
+        else:
+            # chunk_size=None yields bytes as they arrive instead of waiting for fixed-size reads.
+            for line in response.iter_lines(chunk_size=None):
+                collector.feed(line.decode("utf-8", errors="replace"))
+    return collector.finish()
+
+
+async def _astream_completion(
+    model: str,
+    prompt: str,
+    max_tokens: int,
+    on_delta: Optional[DeltaCallback],
+) -> tuple[str, dict]:
+    url = _model_base_url() + "/chat/completions"
+    input_data = _stream_payload(model, prompt, max_tokens)
+    _, semaphore = _async_resources()
+    token = await asyncio.to_thread(_get_token)
+    async with semaphore:
+        response = await _apost_with_retries(
+            url, input_data, timeout=60, headers={"Authorization": f"Bearer {token}"}, stream=True
+        )
+        if response.status_code == 401:
+            await response.aclose()
+            token = await asyncio.to_thread(_refresh_token, token)
+            response = await _apost_with_retries(
+                url, input_data, timeout=60, headers={"Authorization": f"Bearer {token}"}, stream=True
+            )
+        collector = _StreamCollector(prompt, on_delta)
+        try:
+            response.raise_for_status()
+            if not _is_event_stream(response):
+                data = json.loads(await response.aread())
+                collector.reported = _reported_usage(data)
+                collector.add(_completion_content(data))
+            else:
+                async for line in response.aiter_lines():
+                    collector.feed(line)
+        finally:
+            await response.aclose()
+    return collector.finish()
+
+
+def _replay_cached(
+    prompt: str,
+    content: str,
+    on_delta: Optional[DeltaCallback],
+    started: float,
+) -> tuple[str, dict]:
+    if on_delta is not None:
+        on_delta(content)
+    usage = _usage(prompt, content)
+    usage["ttft_seconds"] = 0.0
+    _record_usage(usage, cached=True, started=started)
+    return content, usage
+
+
+def stream_text(
+    prompt: str,
+    max_tokens: int = 1200,
+    on_delta: Optional[DeltaCallback] = None,
+    use_cache: bool = True,
+) -> tuple[str, dict]:
+    started = time.perf_counter()
+    model = os.getenv("MODEL_AS_A_SERVICE_MODEL", "gpt-5")
+    cached, cache_key = _cached_completion(model, prompt, max_tokens, use_cache)
+    if cached is not None:
+        return _replay_cached(prompt, cached, on_delta, started)
+    check_prompt(prompt, max_tokens)
+    content, usage = _stream_completion(model, prompt, max_tokens, on_delta)
+    _store_completion(cache_key, model, max_tokens, content)
+    _record_usage(usage, cached=False, started=started)
+    return content, usage
+
+
+async def astream_text(
+    prompt: str,
+    max_tokens: int = 1200,
+    on_delta: Optional[DeltaCallback] = None,
+    use_cache: bool = True,
+) -> tuple[str, dict]:
+    started = time.perf_counter()
+    model = os.getenv("MODEL_AS_A_SERVICE_MODEL", "gpt-5")
+    cached, cache_key = _cached_completion(model, prompt, max_tokens, use_cache)
+    if cached is not None:
+        return _replay_cached(prompt, cached, on_delta, started)
+    check_prompt(prompt, max_tokens)
+    content, usage = await _astream_completion(model, prompt, max_tokens, on_delta)
+    _store_completion(cache_key, model, max_tokens, content)
+    _record_usage(usage, cached=False, started=started)
+    return content, usage
+
+
+def generate_json_with_retry(
+    prompt: str,
+    max_tokens: int,
+    node_name: str,
+    on_delta: Optional[DeltaCallback] = None,
+) -> tuple[str, dict]:
+    def _call(text: str) -> tuple[str, dict]:
+        if on_delta is not None:
+            return stream_text(text, max_tokens=max_tokens, on_delta=on_delta)
+        return generate_text_with_usage(text, max_tokens=max_tokens)
+
+    raw, usage = _call(prompt)
+    if not raw.strip():
+        print(f"[warn] {node_name} empty response; retrying once")
+        retry_prompt = "Return ONLY valid JSON.\n\n" + prompt
+        raw, usage = _call(retry_prompt)
+    return raw, usage
+
+
+async def agenerate_json_with_retry(
+    prompt: str,
+    max_tokens: int,
+    node_name: str,
+    on_delta: Optional[DeltaCallback] = None,
+) -> tuple[str, dict]:
+    async def _call(text: str) -> tuple[str, dict]:
+        if on_delta is not None:
+            return await astream_text(text, max_tokens=max_tokens, on_delta=on_delta)
+        return await agenerate_text_with_usage(text, max_tokens=max_tokens)
+
+    raw, usage = await _call(prompt)
+    if not raw.strip():
+        print(f"[warn] {node_name} empty response; retrying once")
+        retry_prompt = "Return ONLY valid JSON.\n\n" + prompt
+        raw, usage = await _call(retry_prompt)
+    return raw, usage
 
 
 def strip_python_expr(text: str) -> str:
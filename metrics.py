@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import csv
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Counters per node; "llm" is where calls made outside any node (e.g. batch helpers) are attributed.
+_NODE_FIELDS = (
+    "runs",
+    "seconds",
+    "llm_calls",
+    "cache_hits",
+    "retries",
+    "prompt_tokens",
+    "completion_tokens",
+    "bytes_loaded",
+    "dedup_bytes_saved",
+    "dedup_tokens_saved",
+    "encoding_tokens_saved",
+    "discarded_tokens",
+)
+
+
+@dataclass
+class NodeStats:
+    runs: int = 0
+    seconds: float = 0.0
+    llm_calls: int = 0
+    cache_hits: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    bytes_loaded: int = 0
+    dedup_bytes_saved: int = 0
+    dedup_tokens_saved: int = 0
+    encoding_tokens_saved: int = 0
+    discarded_tokens: int = 0
+
+
+@dataclass
+class CallRecord:
+    node: str
+    latency_seconds: float
+    prompt_tokens: int
+    completion_tokens: int
+    cached: bool
+    reported: bool
+    ttft_seconds: Optional[float] = None
+
+
+@dataclass
+class RunMetrics:
+    started: float = field(default_factory=time.time)
+    nodes: Dict[str, NodeStats] = field(default_factory=dict)
+    calls: List[CallRecord] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    def _node(self, name: str) -> NodeStats:
+        return self.nodes.setdefault(name, NodeStats())
+
+    def add_node_run(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._node(name)
+            stats.runs += 1
+            stats.seconds += seconds
+
+    def add_call(self, record: CallRecord) -> None:
+        with self._lock:
+            self.calls.append(record)
+            stats = self._node(record.node)
+            stats.llm_calls += 1
+            stats.cache_hits += int(record.cached)
+            stats.prompt_tokens += record.prompt_tokens
+            stats.completion_tokens += record.completion_tokens
+
+    def add_retry(self, node: str) -> None:
+        with self._lock:
+            self._node(node).retries += 1
+
+    def add_bytes(self, node: str, count: int) -> None:
+        with self._lock:
+            self._node(node).bytes_loaded += count
+
+    def add_dedup(self, node: str, saved_bytes: int, saved_tokens: int) -> None:
+        with self._lock:
+            stats = self._node(node)
+            stats.dedup_bytes_saved += saved_bytes
+            stats.dedup_tokens_saved += saved_tokens
+
+    def add_encoding_savings(self, node: str, saved_tokens: int) -> None:
+        with self._lock:
+            self._node(node).encoding_tokens_saved += saved_tokens
+
+    def add_discarded(self, node: str, tokens: int) -> None:
+        with self._lock:
+            self._node(node).discarded_tokens += tokens
+
+    def totals(self) -> Dict[str, Any]:
+        with self._lock:
+            totals: Dict[str, Any] = {name: 0 for name in _NODE_FIELDS if name not in {"runs", "seconds"}}
+            for stats in self.nodes.values():
+                for name in totals:
+                    totals[name] += getattr(stats, name)
+            latencies = sorted(c.latency_seconds for c in self.calls if not c.cached)
+        totals["total_tokens"] = totals["prompt_tokens"] + totals["completion_tokens"]
+        totals["wall_seconds"] = round(time.time() - self.started, 3)
+        totals["llm_p50_seconds"] = _percentile(latencies, 0.5)
+        totals["llm_p95_seconds"] = _percentile(latencies, 0.95)
+        return totals
+
+    def as_dict(self) -> Dict[str, Any]:
+        totals = self.totals()
+        with self._lock:
+            nodes = {name: _rounded(asdict(stats)) for name, stats in self.nodes.items()}
+            calls = [asdict(call) for call in self.calls]
+        return {"totals": totals, "nodes": nodes, "calls": calls}
+
+    def write_report(self, path: str) -> None:
+        # The format follows the extension: .csv (one row per node), .prom (Prometheus text), else JSON.
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        report = self.as_dict()
+        suffix = target.suffix.lower()
+        if suffix == ".csv":
+            with target.open("w", newline="", encoding="utf-8") as handle:
+                writer = csv.writer(handle)
+                writer.writerow(["node", *_NODE_FIELDS])
+                for name, stats in report["nodes"].items():
+                    writer.writerow([name, *(stats[f] for f in _NODE_FIELDS)])
+        elif suffix in {".prom", ".txt"}:
+            target.write_text(_prometheus(report), encoding="utf-8")
+        else:
+            target.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+def _rounded(stats: Dict[str, Any]) -> Dict[str, Any]:
+    stats["seconds"] = round(stats["seconds"], 3)
+    return stats
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+
+def _prometheus(report: Dict[str, Any]) -> str:
+    lines = []
+    for name in _NODE_FIELDS:
+        metric = f"brd_node_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        for node, stats in report["nodes"].items():
+            lines.append(f'{metric}{{node="{node}"}} {stats[name]}')
+    for name, value in report["totals"].items():
+        lines.append(f"# TYPE brd_run_{name} gauge")
+        lines.append(f"brd_run_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+_RUN: ContextVar[Optional[RunMetrics]] = ContextVar("brd_run_metrics", default=None)
+_CURRENT_NODE: ContextVar[str] = ContextVar("brd_current_node", default="llm")
+
+
+@contextmanager
+def record_run() -> Iterator[RunMetrics]:
+    run = RunMetrics()
+    token = _RUN.set(run)
+    try:
+        yield run
+    finally:
+        _RUN.reset(token)
+
+
+def instrumented(name: str, fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    # LLM calls, retries and bytes recorded while the node runs are attributed to it via _CURRENT_NODE.
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def _async_node(state: Any) -> Any:
+            token = _CURRENT_NODE.set(name)
+            started = time.perf_counter()
+            try:
+                return await fn(state)
+            finally:
+                _finish_node(name, started)
+                _CURRENT_NODE.reset(token)
+
+        return _async_node
+
+    @functools.wraps(fn)
+    def _node(state: Any) -> Any:
+        token = _CURRENT_NODE.set(name)
+        started = time.perf_counter()
+        try:
+            return fn(state)
+        finally:
+            _finish_node(name, started)
+            _CURRENT_NODE.reset(token)
+
+    return _node
+
+
+def _finish_node(name: str, started: float) -> None:
+    run = _RUN.get()
+    if run is not None:
+        run.add_node_run(name, time.perf_counter() - started)
+
+
+def record_llm_call(usage: Dict[str, Any], cached: bool) -> None:
+    run = _RUN.get()
+    if run is not None:
+        run.add_call(
+            CallRecord(
+                node=_CURRENT_NODE.get(),
+                latency_seconds=round(usage.get("latency_seconds", 0.0), 3),
+                prompt_tokens=usage["prompt_tokens"],
+                completion_tokens=usage["completion_tokens"],
+                cached=cached,
+                reported=bool(usage.get("reported")),
+                ttft_seconds=usage.get("ttft_seconds"),
+            )
+        )
+
+
+def record_retry() -> None:
+    run = _RUN.get()
+    if run is not None:
+        run.add_retry(_CURRENT_NODE.get())
+
+
+def record_bytes_loaded(count: int) -> None:
+    run = _RUN.get()
+    if run is not None:
+        run.add_bytes(_CURRENT_NODE.get(), count)
+
+
+def record_dedup(saved_bytes: int, saved_tokens: int) -> None:
+    run = _RUN.get()
+    if run is not None:
+        run.add_dedup(_CURRENT_NODE.get(), saved_bytes, saved_tokens)
+
+
+def record_encoding_savings(saved_tokens: int) -> None:
+    run = _RUN.get()
+    if run is not None:
+        run.add_encoding_savings(_CURRENT_NODE.get(), saved_tokens)
+
+
+def record_discarded_tokens(tokens: int) -> None:
+    run = _RUN.get()
+    if run is not None:
+        run.add_discarded(_CURRENT_NODE.get(), tokens)
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import hashlib
+import re
+from typing import Annotated, Dict, Iterable, List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -37,6 +39,36 @@ class FactPack(BaseModel):
     integrations: List[Fact] = Field(default_factory=list)
     security_compliance: List[Fact] = Field(default_factory=list)
 
+    @classmethod
+    def merge(cls, packs: Iterable["FactPack"], max_evidence: int = 3) -> "FactPack":
+        packs = list(packs)
+        merged: Dict[str, List[Fact]] = {}
+        for category in cls.model_fields:
+            by_statement: Dict[str, Fact] = {}
+            for pack in packs:
+                for fact in getattr(pack, category):
+                    key = _normalize_statement(fact.statement)
+                    if not key:
+                        continue
+                    existing = by_statement.get(key)
+                    if existing is None:
+                        by_statement[key] = Fact(statement=fact.statement.strip(), evidence=[])
+                        existing = by_statement[key]
+                    for ev in fact.evidence:
+                        if len(existing.evidence) >= max_evidence:
+                            break
+                        if all(
+                            (ev.source_name, ev.locator, ev.quote) != (e.source_name, e.locator, e.quote)
+                            for e in existing.evidence
+                        ):
+                            existing.evidence.append(ev)
+            merged[category] = list(by_statement.values())
+        return cls(**merged)
+
+
+def _normalize_statement(statement: str) -> str:
+    return re.sub(r"\s+", " ", statement).strip().rstrip(".;").lower()
+
 
 class TemplateSectionSpec(BaseModel):
     name: str
@@ -70,6 +102,11 @@ class BRDOutline(BaseModel):
     ordered_sections: List[str] = Field(default_factory=list)
 
 
+class FeedbackRouting(BaseModel):
+    sections: List[str] = Field(default_factory=list)
+    applies_to_all: bool = False
+
+
 class BRDModel(BaseModel):
     sections: List[str] = Field(default_factory=list)
     open_questions: List[str] = Field(default_factory=list)
@@ -80,22 +117,65 @@ class BRDAssemblyOut(BaseModel):
     brd_markdown: str
 
 
+def merge_counts(left: Dict[str, int], right: Dict[str, int]) -> Dict[str, int]:
+    # Reducer for counters keyed by node: parallel branches write different keys, full-state writes are idempotent.
+    return {**left, **right}
+
+
 class BRDState(BaseModel):
     template_path: str
+    run_id: Optional[str] = None
+    template_spec: Optional[BRDTemplateSpec] = None
     inputs: List[str] = Field(default_factory=list)
     brownfield_inputs: List[str] = Field(default_factory=list)
+    loaded_files: List[str] = Field(default_factory=list)
+    loader_workers: int = 4
+    extract_cache_dir: Optional[str] = None
+    near_duplicate_threshold: float = 0.9
     source_texts: List[str] = Field(default_factory=list)
     brownfield_texts: List[str] = Field(default_factory=list)
     intake: Optional[IntakeSummary] = None
     facts: FactPack = Field(default_factory=FactPack)
+    fact_cache: Dict[str, FactPack] = Field(default_factory=dict)
     gaps: GapReport = Field(default_factory=GapReport)
     outline: BRDOutline = Field(default_factory=BRDOutline)
     section_drafts: List[str] = Field(default_factory=list)
     brd_markdown: str = ""
     brd_model: Optional[BRDModel] = None
     user_force_generate: bool = False
+    speculate: bool = False
+    speculated: bool = False
     human_feedback: Optional[str] = None
+    section_feedback: Dict[str, str] = Field(default_factory=dict)
     approved: bool = False
+    gap_policy: str = "interactive"
+    review_policy: str = "interactive"
+    decisions_path: Optional[str] = None
+    gap_rounds: int = 0
+    max_gap_rounds: int = 3
+    gaps_inputs_key: Optional[str] = None
+    stop_reason: Optional[str] = None
+    token_budget: Optional[int] = None
+    # Billed tokens per node; a reducer field so parallel branches can both charge the budget.
+    node_tokens: Annotated[Dict[str, int], merge_counts] = Field(default_factory=dict)
+    review_rounds: int = 0
     output_docx_path: Optional[str] = None
     chunk_size: int = 3000
     max_chunks: int = 40
+    max_concurrency: int = 4
+    retrieval_top_k: int = 8
+    section_context_tokens: int = 3000
+    stream: bool = False
+    stream_dir: Optional[str] = None
+    assembler_mode: str = "local"
+
+    @property
+    def tokens_used(self) -> int:
+        return sum(self.node_tokens.values())
+
+    def inputs_key(self) -> str:
+        # Identifies the loaded corpus by content, so a gap loop that added nothing new can be detected.
+        digest = hashlib.sha256()
+        for text in sorted(self.source_texts + self.brownfield_texts):
+            digest.update(hashlib.sha256(text.encode("utf-8", errors="ignore")).digest())
+        return digest.hexdigest()
@@ -1,12 +1,15 @@
 from __future__ import annotations
 
 import json
-from pathlib import Path
+from typing import Dict, Optional
 
+from ..assembly import assemble_brd, terminology_candidates, terminology_prompt
 from ..debug import debug_state
-from ..llm_utils import generate_text_with_usage, parse_json_model
+from ..llm_utils import agenerate_json_with_retry, generate_json_with_retry, parse_json_model, strip_json
 from ..models import BRDAssemblyOut, BRDModel, BRDState
-from ..template import build_template_spec
+from ..prompt_encoding import FACTS_FORMAT, prompt_facts, prompt_template
+from ..tokens import count_tokens, prompt_budget
+from .shared import DraftStream, stream_summary, template_spec_for
 
 try:
     from docx import Document
@@ -14,10 +17,20 @@ except Exception:
     Document = None
 
 
-def assembler_node(state: BRDState) -> BRDState:
-    print("[node] assembler")
-    template_spec = build_template_spec(Path(state.template_path))
-    prompt = f"""SYSTEM
+_ASSEMBLER_MAX_TOKENS = 2000
+
+
+def _assembler_prompt(state: BRDState) -> str:
+    # Drafts are the document itself and are never trimmed; the FactPack absorbs any overflow.
+    drafts_json = json.dumps(state.section_drafts, indent=2)
+    template_json = prompt_template(template_spec_for(state))
+    fixed = count_tokens(_render_assembler_prompt(drafts_json, "", template_json))
+    facts_json = prompt_facts(state.facts, prompt_budget(_ASSEMBLER_MAX_TOKENS) - fixed)
+    return _render_assembler_prompt(drafts_json, facts_json, template_json)
+
+
+def _render_assembler_prompt(drafts_json: str, facts_json: str, template_json: str) -> str:
+    return f"""SYSTEM
 You are a BRD compiler and schema validator.
 
 USER
@@ -38,15 +51,13 @@ Return valid JSON that matches this schema:
 }}
 
 INPUTS:
-- Ordered sections (list of markdown strings): {json.dumps(state.section_drafts, indent=2)}
-- FactPack: {json.dumps(state.facts.model_dump(), indent=2)}
-- BRDTemplateSpec: {json.dumps(template_spec.model_dump(), indent=2)}
+- Ordered sections (list of markdown strings): {drafts_json}
+- FactPack ({FACTS_FORMAT}): {facts_json}
+- BRDTemplateSpec: {template_json}
 """
-    raw, usage = generate_text_with_usage(prompt, max_tokens=2000)
-    if not raw.strip():
-        print("[warn] assembler empty response; retrying once")
-        retry_prompt = "Return ONLY valid JSON.\n\n" + prompt
-        raw, usage = generate_text_with_usage(retry_prompt, max_tokens=2000)
+
+
+def _apply_assembly(state: BRDState, raw: str, usage: dict) -> BRDState:
     if not raw.strip():
         print("[warn] assembler still empty; using fallback markdown from section drafts")
         state.brd_model = BRDModel(
@@ -66,6 +77,102 @@ INPUTS:
     return state
 
 
+_TERMINOLOGY_MAX_TOKENS = 400
+
+
+def _local_assembly(state: BRDState, terminology: Optional[Dict[str, str]] = None) -> BRDState:
+    state.brd_model, state.brd_markdown = assemble_brd(
+        state.outline.ordered_sections,
+        state.section_drafts,
+        state.gaps,
+        state.intake,
+        terminology,
+    )
+    return state
+
+
+def _parse_terminology(raw: str) -> Dict[str, str]:
+    try:
+        data = json.loads(strip_json(raw))
+    except json.JSONDecodeError:
+        print("[warn] assembler terminology pass returned invalid JSON; keeping original terms")
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {str(k): str(v) for k, v in data.items() if isinstance(v, str)}
+
+
+def _finish_local(state: BRDState, usage: dict) -> BRDState:
+    print(
+        f"[node] assembler tokens_used={usage['total_tokens']} "
+        f"(prompt={usage['prompt_tokens']} completion={usage['completion_tokens']}) "
+        f"mode={state.assembler_mode} sections={len(state.brd_model.sections)} "
+        f"open_questions={len(state.brd_model.open_questions)}"
+    )
+    debug_state("assembler", state)
+    return state
+
+
+def _no_usage() -> dict:
+    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+
+
+def assembler_node(state: BRDState) -> BRDState:
+    print("[node] assembler")
+    if state.assembler_mode == "llm":
+        return _llm_assembler(state)
+    _local_assembly(state)
+    usage = _no_usage()
+    terms = terminology_candidates(state.brd_markdown) if state.assembler_mode == "normalize" else []
+    if terms:
+        # Only the candidate term list goes to the model; the mapping is applied locally.
+        raw, usage = generate_json_with_retry(
+            terminology_prompt(terms), _TERMINOLOGY_MAX_TOKENS, "assembler_terminology"
+        )
+        _local_assembly(state, _parse_terminology(raw))
+    return _finish_local(state, usage)
+
+
+async def aassembler_node(state: BRDState) -> BRDState:
+    print("[node] assembler")
+    if state.assembler_mode == "llm":
+        return await _allm_assembler(state)
+    _local_assembly(state)
+    usage = _no_usage()
+    terms = terminology_candidates(state.brd_markdown) if state.assembler_mode == "normalize" else []
+    if terms:
+        raw, usage = await agenerate_json_with_retry(
+            terminology_prompt(terms), _TERMINOLOGY_MAX_TOKENS, "assembler_terminology"
+        )
+        _local_assembly(state, _parse_terminology(raw))
+    return _finish_local(state, usage)
+
+
+def _llm_assembler(state: BRDState) -> BRDState:
+    if not state.stream:
+        raw, usage = generate_json_with_retry(_assembler_prompt(state), _ASSEMBLER_MAX_TOKENS, "assembler")
+        return _apply_assembly(state, raw, usage)
+    # The JSON envelope is streamed to <stream_dir>/brd_assembly.md so progress is visible before parsing.
+    with DraftStream(state.stream_dir, "brd_assembly") as sink:
+        raw, usage = generate_json_with_retry(
+            _assembler_prompt(state), _ASSEMBLER_MAX_TOKENS, "assembler", on_delta=sink
+        )
+    print(stream_summary("assembler", usage))
+    return _apply_assembly(state, raw, usage)
+
+
+async def _allm_assembler(state: BRDState) -> BRDState:
+    if not state.stream:
+        raw, usage = await agenerate_json_with_retry(_assembler_prompt(state), _ASSEMBLER_MAX_TOKENS, "assembler")
+        return _apply_assembly(state, raw, usage)
+    with DraftStream(state.stream_dir, "brd_assembly") as sink:
+        raw, usage = await agenerate_json_with_retry(
+            _assembler_prompt(state), _ASSEMBLER_MAX_TOKENS, "assembler", on_delta=sink
+        )
+    print(stream_summary("assembler", usage))
+    return _apply_assembly(state, raw, usage)
+
+
 def persist_doc_node(state: BRDState) -> BRDState:
     print("[node] persist_doc")
     if not state.output_docx_path:
@@ -1,23 +1,30 @@
 from __future__ import annotations
 
-from ..debug import debug_state, format_sources
-from ..llm_utils import generate_text_with_usage, parse_json_model
+import asyncio
+from typing import Any, Dict, List, Set, Union
+
+from ..chunking import SourceChunk, chunk_sources, content_key
+from ..debug import debug_state
+from ..llm_utils import (
+    agenerate_json_with_retry,
+    generate_json_with_retry,
+    parse_json_model,
+    thread_map,
+)
 from ..models import BRDState, FactPack
 
 
-def fact_extractor_node(state: BRDState) -> BRDState:
-    print("[node] fact_extractor")
-    inputs_text = format_sources(state.source_texts)
-    brownfield_text = format_sources(state.brownfield_texts)
-    # Prints the meeting transcript
-    # print(inputs_text)
-    prompt = f"""SYSTEM
+def _chunk_prompt(chunk: SourceChunk) -> str:
+    inputs_text = "" if chunk.label == "brownfield" else chunk.render()
+    brownfield_text = chunk.render() if chunk.label == "brownfield" else ""
+    return f"""SYSTEM
 You are a forensic BA. Do NOT invent. Every fact must include evidence.
 
 USER
 Task:
 - Build a FactPack from the provided inputs.
 - For each fact, attach 1-3 Evidence items (source_name, locator, quote).
+- Use the name and locator from the [SOURCE: name | locator] header for source_name and locator.
 - If a category has no facts, keep it empty.
 
 Output:
@@ -29,19 +36,99 @@ INPUTS:
 OPTIONAL_BROWNFIELD:
 {brownfield_text}
 """
-    raw, usage = generate_text_with_usage(prompt, max_tokens=1800)
-    if not raw.strip():
-        print("[warn] fact_extractor empty response; retrying once")
-        retry_prompt = "Return ONLY valid JSON.\n\n" + prompt
-        raw, usage = generate_text_with_usage(retry_prompt, max_tokens=1800)
+
+
+def _chunk_label(chunk: SourceChunk) -> str:
+    return f"fact_extractor[{chunk.source_name} {chunk.locator}]"
+
+
+def _parse_chunk(chunk: SourceChunk, raw: str) -> FactPack:
     if not raw.strip():
-        print("[warn] fact_extractor still empty; using fallback empty FactPack")
-        state.facts = FactPack()
-    else:
-        state.facts = parse_json_model(raw, FactPack)
+        print(f"[warn] {_chunk_label(chunk)} still empty; using empty FactPack")
+        return FactPack()
+    return parse_json_model(raw, FactPack)
+
+
+def _extract_chunk(chunk: SourceChunk) -> tuple[FactPack, dict]:
+    raw, usage = generate_json_with_retry(_chunk_prompt(chunk), 1800, _chunk_label(chunk))
+    return _parse_chunk(chunk, raw), usage
+
+
+async def _aextract_chunk(chunk: SourceChunk, limit: asyncio.Semaphore) -> tuple[FactPack, dict]:
+    async with limit:
+        raw, usage = await agenerate_json_with_retry(_chunk_prompt(chunk), 1800, _chunk_label(chunk))
+    return _parse_chunk(chunk, raw), usage
+
+
+def _plan_chunks(state: BRDState) -> tuple[List[SourceChunk], Set[str]]:
+    # Sources whose FactPack is already cached (by content hash) are not re-extracted.
+    chunks, dropped = chunk_sources(
+        [text for text in state.source_texts if content_key(text) not in state.fact_cache],
+        [text for text in state.brownfield_texts if content_key(text) not in state.fact_cache],
+        chunk_size=state.chunk_size,
+        max_chunks=state.max_chunks,
+    )
+    if dropped:
+        print(
+            f"[warn] fact_extractor max_chunks={state.max_chunks} reached; "
+            f"skipped {sum(dropped.values())} chunk(s)"
+        )
+    return chunks, set(dropped)
+
+
+def _apply_facts(
+    state: BRDState,
+    chunks: List[SourceChunk],
+    incomplete: Set[str],
+    results: List[tuple[FactPack, dict]],
+) -> BRDState:
+    total_tokens = sum(usage["total_tokens"] for _, usage in results)
+    total_prompt = sum(usage["prompt_tokens"] for _, usage in results)
+    total_completion = sum(usage["completion_tokens"] for _, usage in results)
+
+    current_keys = list(dict.fromkeys(content_key(t) for t in state.source_texts + state.brownfield_texts))
+    reused = sum(1 for key in current_keys if key in state.fact_cache)
+
+    per_source: Dict[str, List[FactPack]] = {}
+    for chunk, (pack, _) in zip(chunks, results):
+        per_source.setdefault(chunk.source_key, []).append(pack)
+    partial: List[FactPack] = []
+    for key, packs in per_source.items():
+        if key in incomplete:
+            # Truncated by max_chunks: use it this round, but let a later round extract it fully.
+            partial.append(FactPack.merge(packs))
+        else:
+            state.fact_cache[key] = FactPack.merge(packs)
+
+    cached = [state.fact_cache[key] for key in current_keys if key in state.fact_cache]
+    state.facts = FactPack.merge(cached + partial)
     print(
-        f"[node] fact_extractor tokens_used={usage['total_tokens']} "
-        f"(prompt={usage['prompt_tokens']} completion={usage['completion_tokens']})"
+        f"[node] fact_extractor tokens_used={total_tokens} "
+        f"(prompt={total_prompt} completion={total_completion}) chunks={len(results)} "
+        f"extracted_sources={len(per_source)} reused_sources={reused}"
     )
     debug_state("fact_extractor", state)
     return state
+
+
+def _facts_update(state: BRDState) -> Union[BRDState, Dict[str, Any]]:
+    # On the first pass fact extraction runs in parallel with intake, so it returns only the fields it owns.
+    # Gap-loop passes run alone and return the full state, which is checkpointed like any other node.
+    if state.intake is None:
+        return {"facts": state.facts, "fact_cache": state.fact_cache}
+    return state
+
+
+def fact_extractor_node(state: BRDState) -> Union[BRDState, Dict[str, Any]]:
+    print("[node] fact_extractor")
+    chunks, incomplete = _plan_chunks(state)
+    results = thread_map(_extract_chunk, chunks, state.max_concurrency)
+    return _facts_update(_apply_facts(state, chunks, incomplete, results))
+
+
+async def afact_extractor_node(state: BRDState) -> Union[BRDState, Dict[str, Any]]:
+    print("[node] fact_extractor")
+    chunks, incomplete = _plan_chunks(state)
+    limit = asyncio.Semaphore(max(1, state.max_concurrency))
+    results = list(await asyncio.gather(*(_aextract_chunk(chunk, limit) for chunk in chunks)))
+    return _facts_update(_apply_facts(state, chunks, incomplete, results))
@@ -1,18 +1,26 @@
 from __future__ import annotations
 
-import json
-from pathlib import Path
-
 from ..debug import debug_state
-from ..llm_utils import generate_text_with_usage, parse_json_model
+from ..llm_utils import agenerate_json_with_retry, generate_json_with_retry, parse_json_model
 from ..models import BRDState, GapReport
-from ..template import build_template_spec
+from ..review_policies import WAITING_GAP_POLICIES, decide_gaps
+from ..prompt_encoding import FACTS_FORMAT, prompt_facts, prompt_template
+from ..tokens import count_tokens, prompt_budget
+from .shared import template_spec_for
+from .speculation import Speculation
 
 
-def gap_checker_node(state: BRDState) -> BRDState:
-    print("[node] gap_checker")
-    template_spec = build_template_spec(Path(state.template_path))
-    prompt = f"""SYSTEM
+_GAP_MAX_TOKENS = 1400
+
+
+def _gap_checker_prompt(state: BRDState) -> str:
+    template_json = prompt_template(template_spec_for(state))
+    budget = prompt_budget(_GAP_MAX_TOKENS) - count_tokens(_render_gap_prompt("", template_json))
+    return _render_gap_prompt(prompt_facts(state.facts, budget), template_json)
+
+
+def _render_gap_prompt(facts_json: str, template_json: str) -> str:
+    return f"""SYSTEM
 You are a BRD template checker.
 
 USER
@@ -28,22 +36,21 @@ Task:
 Output:
 Return valid JSON that matches the GapReport schema.
 
-FACTS (FactPack instance):
-{json.dumps(state.facts.model_dump(), indent=2)}
+FACTS ({FACTS_FORMAT}):
+{facts_json}
 
 TEMPLATE (BRDTemplateSpec instance):
-{json.dumps(template_spec.model_dump(), indent=2)}
+{template_json}
 """
-    raw, usage = generate_text_with_usage(prompt, max_tokens=1400)
-    if not raw.strip():
-        print("[warn] gap_checker empty response; retrying once")
-        retry_prompt = "Return ONLY valid JSON.\n\n" + prompt
-        raw, usage = generate_text_with_usage(retry_prompt, max_tokens=1400)
+
+
+def _apply_gap_report(state: BRDState, raw: str, usage: dict) -> BRDState:
     if not raw.strip():
         print("[warn] gap_checker still empty; using fallback empty GapReport")
         state.gaps = GapReport()
     else:
         state.gaps = parse_json_model(raw, GapReport)
+    state.gaps_inputs_key = state.inputs_key()
     print(
         f"[node] gap_checker tokens_used={usage['total_tokens']} "
         f"(prompt={usage['prompt_tokens']} completion={usage['completion_tokens']})"
@@ -52,8 +59,21 @@ TEMPLATE (BRDTemplateSpec instance):
     return state
 
 
+def gap_checker_node(state: BRDState) -> BRDState:
+    print("[node] gap_checker")
+    raw, usage = generate_json_with_retry(_gap_checker_prompt(state), _GAP_MAX_TOKENS, "gap_checker")
+    return _apply_gap_report(state, raw, usage)
+
+
+async def agap_checker_node(state: BRDState) -> BRDState:
+    print("[node] gap_checker")
+    raw, usage = await agenerate_json_with_retry(_gap_checker_prompt(state), _GAP_MAX_TOKENS, "gap_checker")
+    return _apply_gap_report(state, raw, usage)
+
+
 def gap_human_review_node(state: BRDState) -> BRDState:
     print("[node] gap_human_review")
+    state.speculated = False
     has_gaps = bool(state.gaps.blocking or state.gaps.non_blocking)
     if not has_gaps:
         state.user_force_generate = False
@@ -61,18 +81,31 @@ def gap_human_review_node(state: BRDState) -> BRDState:
         debug_state("gap_human_review", state)
         return state
     print("Gaps detected.")
-    choice = input("Generate anyway? (y/n): ").strip().lower()
-    if choice in {"y", "yes"}:
-        state.user_force_generate = True
-        print("[node] gap_human_review tokens_used=0")
-        debug_state("gap_human_review", state)
-        return state
-
-    more = input("Provide additional input paths (comma-separated) or leave empty to stop: ").strip()
-    if more:
-        for item in [p.strip() for p in more.split(",") if p.strip()]:
-            state.inputs.append(item)
-    state.user_force_generate = False
+    # Only worth it when the decision waits on a person; the outline does not depend on the decision.
+    speculation = Speculation(state).start() if state.speculate and state.gap_policy in WAITING_GAP_POLICIES else None
+    try:
+        decision = decide_gaps(state)
+    except BaseException:
+        if speculation is not None:
+            speculation.discard()
+        raise
+    state.gap_rounds += 1
+    state.user_force_generate = decision.generate
+    if speculation is not None:
+        if decision.generate:
+            state.speculated = speculation.adopt(state)
+        else:
+            speculation.discard()
+    if not decision.generate:
+        new_inputs = [p for p in decision.extra_inputs if p not in state.inputs]
+        state.inputs.extend(new_inputs)
+        # Re-checking an unchanged corpus would only reproduce the same gaps, so the loop stops instead.
+        if not new_inputs:
+            state.stop_reason = "gaps unresolved and no new inputs were provided"
+        elif state.gap_rounds >= state.max_gap_rounds:
+            state.stop_reason = f"gaps unresolved after max_gap_rounds={state.max_gap_rounds}"
+        if state.stop_reason:
+            print(f"[stop] {state.stop_reason}")
     print("[node] gap_human_review tokens_used=0")
     debug_state("gap_human_review", state)
     return state
@@ -1,44 +1,132 @@
 from __future__ import annotations
 
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
 from ..debug import debug_state, format_sources
-from ..file_loaders import iter_input_files, load_source_text
-from ..llm_utils import generate_text_with_usage, parse_json_model
+from ..chunking import strip_locator_markers
+from ..dedup import ContentIndex, DedupReport, duplicate_record, unique_files
+from ..file_loaders import LoadResult, iter_input_files, load_source_texts
+from ..llm_utils import agenerate_json_with_retry, generate_json_with_retry, parse_json_model
+from ..metrics import record_bytes_loaded, record_dedup
 from ..models import BRDState, IntakeSummary
+from ..tokens import count_tokens, fit_texts, prompt_budget
+
+
+def _new_files(paths: List[str], loaded: Set[str]) -> List[Path]:
+    files = []
+    for file_path in iter_input_files(paths):
+        key = str(file_path.resolve())
+        if key not in loaded:
+            loaded.add(key)
+            files.append(file_path)
+    return files
+
+
+def _to_texts(results: List[LoadResult]) -> List[str]:
+    return [f"[SOURCE: {r.path.name}]\n{r.text}" for r in results if r.text and r.text.strip()]
+
+
+def _source_body(text: str) -> tuple[str, str]:
+    header, _, body = text.partition("\n")
+    return header[len("[SOURCE: "):-1], strip_locator_markers(body)
+
+
+def _load_new_sources(state: BRDState) -> tuple[List[LoadResult], int, DedupReport]:
+    # On the gap loop only files added since the previous load are read.
+    loaded = set(state.loaded_files)
+    input_files = _new_files(state.inputs, loaded)
+    brownfield_files = _new_files(state.brownfield_inputs, loaded)
+    # Byte-identical copies are never extracted. Inputs come first, so a file given both ways stays an input.
+    files, copies = unique_files(input_files + brownfield_files)
+    # One pass over both lists so the process pool is shared by inputs and brownfield docs.
+    results = load_source_texts(
+        files,
+        workers=state.loader_workers,
+        cache_dir=state.extract_cache_dir,
+    )
+    report = DedupReport()
+    by_path = {r.path: r for r in results}
+    for copy, original in copies.items():
+        text = by_path[original].text or ""
+        report.duplicates.append(duplicate_record(copy.name, original.name, "file", 1.0, text))
+
+    # Re-exports and re-wrapped copies are caught on the extracted text, including against earlier rounds.
+    index = ContentIndex(state.near_duplicate_threshold)
+    for text in state.source_texts + state.brownfield_texts:
+        index.match(*_source_body(text))
+    kept = []
+    for result in results:
+        if not result.text or not result.text.strip():
+            continue
+        match = index.match(result.path.name, result.text)
+        if match is None:
+            kept.append(result)
+        else:
+            report.duplicates.append(duplicate_record(result.path.name, *match, result.text))
+    inputs = set(input_files)
+    new_texts = _to_texts([r for r in kept if r.path in inputs])
+    new_brownfield = _to_texts([r for r in kept if r.path not in inputs])
+    state.source_texts = state.source_texts + new_texts
+    state.brownfield_texts = state.brownfield_texts + new_brownfield
+    state.loaded_files = sorted(loaded)
+    return results, len(new_texts) + len(new_brownfield), report
 
 
 def load_sources_node(state: BRDState) -> BRDState:
     print("[node] load_sources")
-    files = list(iter_input_files(state.inputs))
-    texts = []
-    for file_path in files:
-        try:
-            text = load_source_text(file_path)
-        except Exception:
-            continue
-        if text.strip():
-            texts.append(f"[SOURCE: {file_path.name}]\n{text}")
-    state.source_texts = texts
-
-    brownfield_files = list(iter_input_files(state.brownfield_inputs))
-    brownfield_texts = []
-    for file_path in brownfield_files:
-        try:
-            text = load_source_text(file_path)
-        except Exception:
-            continue
-        if text.strip():
-            brownfield_texts.append(f"[SOURCE: {file_path.name}]\n{text}")
-    state.brownfield_texts = brownfield_texts
+    started = time.perf_counter()
+    results, new_sources, report = _load_new_sources(state)
+    cached = sum(1 for r in results if r.cached)
+    loaded_bytes = sum(r.bytes for r in results)
+    record_bytes_loaded(loaded_bytes)
+    record_dedup(report.bytes_saved, report.tokens_saved)
+    for duplicate in report.duplicates:
+        print(f"[dedup] skipped {duplicate.path} ({duplicate.describe()})")
+    print(
+        f"[node] load_sources new_sources={new_sources} "
+        f"files={len(results)} cached={cached} bytes={loaded_bytes} seconds={time.perf_counter() - started:.2f}"
+    )
+    if report.duplicates:
+        print(
+            f"[dedup] duplicates={len(report.duplicates)} "
+            f"bytes_saved={report.bytes_saved} tokens_saved={report.tokens_saved}"
+        )
+    if state.intake is not None and not new_sources:
+        print("[node] load_sources no new inputs; reusing the previous FactPack and GapReport")
     print("[node] load_sources tokens_used=0")
     debug_state("load_sources", state)
     return state
 
 
-def intake_node(state: BRDState) -> BRDState:
-    print("[node] intake_and_classification")
-    inputs_text = format_sources(state.source_texts)
-    brownfield_text = format_sources(state.brownfield_texts)
-    prompt = f"""SYSTEM
+def reload_sources(state: BRDState) -> BRDState:
+    # Checkpoints omit raw texts, so a resumed run re-reads every input (cheap with --extract-cache).
+    state.loaded_files = []
+    state.source_texts = []
+    state.brownfield_texts = []
+    results, new_sources, _ = _load_new_sources(state)
+    print(f"[resume] reloaded sources={new_sources} files={len(results)}")
+    return state
+
+
+_INTAKE_MAX_TOKENS = 800
+
+
+def _intake_prompt(state: BRDState) -> str:
+    # Every source gets a fair share of the context window; the largest ones are truncated first.
+    # Locator markers only matter to chunking, so they are not paid for here.
+    budget = prompt_budget(_INTAKE_MAX_TOKENS) - count_tokens(_render_intake_prompt("", ""))
+    texts = fit_texts([strip_locator_markers(t) for t in state.source_texts + state.brownfield_texts], budget)
+    split = len(state.source_texts)
+    return _render_intake_prompt(
+        format_sources([t for t in texts[:split] if t]),
+        format_sources([t for t in texts[split:] if t]),
+    )
+
+
+def _render_intake_prompt(inputs_text: str, brownfield_text: str) -> str:
+    return f"""SYSTEM
 You are an expert Business Analyst. Use only the provided inputs.
 
 USER
@@ -62,11 +150,9 @@ INPUTS:
 OPTIONAL_BROWNFIELD:
 {brownfield_text}
 """
-    raw, usage = generate_text_with_usage(prompt, max_tokens=800)
-    if not raw.strip():
-        print("[warn] intake_and_classification empty response; retrying once")
-        retry_prompt = "Return ONLY valid JSON.\n\n" + prompt
-        raw, usage = generate_text_with_usage(retry_prompt, max_tokens=800)
+
+
+def _apply_intake(state: BRDState, raw: str, usage: dict) -> BRDState:
     if not raw.strip():
         print("[warn] intake_and_classification still empty; using fallback IntakeSummary")
         state.intake = IntakeSummary(
@@ -84,3 +170,20 @@ OPTIONAL_BROWNFIELD:
     )
     debug_state("intake_and_classification", state)
     return state
+
+
+# Intake runs in parallel with fact_extractor, so it returns only the field it owns.
+def intake_node(state: BRDState) -> Dict[str, Any]:
+    print("[node] intake_and_classification")
+    raw, usage = generate_json_with_retry(
+        _intake_prompt(state), _INTAKE_MAX_TOKENS, "intake_and_classification"
+    )
+    return {"intake": _apply_intake(state, raw, usage).intake}
+
+
+async def aintake_node(state: BRDState) -> Dict[str, Any]:
+    print("[node] intake_and_classification")
+    raw, usage = await agenerate_json_with_retry(
+        _intake_prompt(state), _INTAKE_MAX_TOKENS, "intake_and_classification"
+    )
+    return {"intake": _apply_intake(state, raw, usage).intake}
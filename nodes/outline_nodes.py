@@ -1,18 +1,26 @@
 from __future__ import annotations
 
-import json
-from pathlib import Path
-
 from ..debug import debug_state
-from ..llm_utils import generate_text_with_usage, parse_json_model
+from ..llm_utils import agenerate_json_with_retry, generate_json_with_retry, parse_json_model
 from ..models import BRDOutline, BRDState
-from ..template import build_template_spec
+from ..prompt_encoding import FACTS_FORMAT, prompt_facts, prompt_gaps, prompt_template
+from ..tokens import count_tokens, prompt_budget
+from .shared import template_spec_for
 
 
-def outline_builder_node(state: BRDState) -> BRDState:
-    print("[node] outline_builder")
-    template_spec = build_template_spec(Path(state.template_path))
-    prompt = f"""SYSTEM
+_OUTLINE_MAX_TOKENS = 800
+
+
+def _outline_prompt(state: BRDState) -> str:
+    template_json = prompt_template(template_spec_for(state))
+    gaps_json = prompt_gaps(state.gaps)
+    fixed = count_tokens(_render_outline_prompt("", template_json, gaps_json))
+    facts_json = prompt_facts(state.facts, prompt_budget(_OUTLINE_MAX_TOKENS) - fixed)
+    return _render_outline_prompt(facts_json, template_json, gaps_json)
+
+
+def _render_outline_prompt(facts_json: str, template_json: str, gaps_json: str) -> str:
+    return f"""SYSTEM
 You are a BRD editor.
 
 USER
@@ -25,24 +33,22 @@ Task:
 Output:
 Return valid JSON that matches the BRDOutline schema.
 
-FACTS (FactPack instance):
-{json.dumps(state.facts.model_dump(), indent=2)}
+FACTS ({FACTS_FORMAT}):
+{facts_json}
 
 TEMPLATE (BRDTemplateSpec instance):
-{json.dumps(template_spec.model_dump(), indent=2)}
+{template_json}
 
 GAPS (GapReport instance):
-{json.dumps(state.gaps.model_dump(), indent=2)}
+{gaps_json}
 """
-    raw, usage = generate_text_with_usage(prompt, max_tokens=800)
-    if not raw.strip():
-        print("[warn] outline_builder empty response; retrying once")
-        retry_prompt = "Return ONLY valid JSON.\n\n" + prompt
-        raw, usage = generate_text_with_usage(retry_prompt, max_tokens=800)
+
+
+def _apply_outline(state: BRDState, raw: str, usage: dict) -> BRDState:
     if not raw.strip():
         print("[warn] outline_builder still empty; using fallback outline from template sections")
         state.outline = BRDOutline(
-            ordered_sections=[s.name for s in template_spec.sections]
+            ordered_sections=[s.name for s in template_spec_for(state).sections]
         )
     else:
         state.outline = parse_json_model(raw, BRDOutline)
@@ -52,3 +58,15 @@ GAPS (GapReport instance):
     )
     debug_state("outline_builder", state)
     return state
+
+
+def outline_builder_node(state: BRDState) -> BRDState:
+    print("[node] outline_builder")
+    raw, usage = generate_json_with_retry(_outline_prompt(state), _OUTLINE_MAX_TOKENS, "outline_builder")
+    return _apply_outline(state, raw, usage)
+
+
+async def aoutline_builder_node(state: BRDState) -> BRDState:
+    print("[node] outline_builder")
+    raw, usage = await agenerate_json_with_retry(_outline_prompt(state), _OUTLINE_MAX_TOKENS, "outline_builder")
+    return _apply_outline(state, raw, usage)
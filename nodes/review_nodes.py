@@ -1,32 +1,147 @@
 from __future__ import annotations
 
+import re
+from typing import Dict, List, Optional
+
 from ..debug import debug_state
-from ..models import BRDState
+from ..llm_utils import agenerate_json_with_retry, generate_json_with_retry, parse_json_model
+from ..models import BRDState, FeedbackRouting
+from ..review_policies import decide_review
+
+# "[Section name] comment" or "@Section name: comment"; untagged lines continue the previous tag.
+_SECTION_TAG = re.compile(r"^\s*(?:\[(?P<bracket>[^\]]+)\]|@(?P<at>[^:]+):)\s*(?P<text>.*)$")
 
 
 def human_review_node(state: BRDState) -> BRDState:
     print("[node] human_review")
-    print("\n--- GENERATED BRD ---\n")
-    print(state.brd_markdown)
-    choice = input("Approve BRD? (y/n): ").strip().lower()
-    if choice in {"y", "yes"}:
-        state.approved = True
-        state.human_feedback = None
-    else:
-        state.approved = False
-        state.human_feedback = input("Provide feedback or corrections: ").strip()
+    decision = decide_review(state)
+    state.review_rounds += 1
+    state.approved = decision.approve
+    state.human_feedback = None if decision.approve else decision.feedback
     print("[node] human_review tokens_used=0")
     debug_state("human_review", state)
     return state
 
 
+def _match_section(name: str, sections: List[str]) -> Optional[str]:
+    wanted = name.strip().lower()
+    for section in sections:
+        if section.strip().lower() == wanted:
+            return section
+    return None
+
+
+def parse_tagged_feedback(feedback: str, sections: List[str]) -> Dict[str, str]:
+    # Returns {} unless every line can be attributed to a known section, so text before the first tag or
+    # under an unknown tag is never dropped: the caller then routes the whole feedback instead.
+    targeted: Dict[str, List[str]] = {}
+    current: Optional[str] = None
+    untagged = False
+    for line in feedback.splitlines():
+        match = _SECTION_TAG.match(line)
+        if match:
+            tag = match.group("bracket") or match.group("at")
+            current = _match_section(tag, sections)
+            if current is None:
+                print(f"[warn] apply_feedback unknown section tag: {tag.strip()}")
+            line = match.group("text")
+        if not line.strip():
+            continue
+        if current is None:
+            untagged = True
+        else:
+            targeted.setdefault(current, []).append(line.strip())
+    if untagged and targeted:
+        print("[node] apply_feedback feedback has untagged text; routing all of it")
+        return {}
+    return {section: "\n".join(lines) for section, lines in targeted.items()}
+
+
+def _routing_prompt(state: BRDState) -> str:
+    sections = "\n".join(f"- {name}" for name in state.outline.ordered_sections)
+    return f"""SYSTEM
+You route BRD review feedback to the sections it concerns.
+
+USER
+Task:
+- Read the reviewer feedback and the ordered BRD section names.
+- List the exact section names whose content must change to address the feedback.
+- Set applies_to_all to true if the feedback changes the document structure or every section.
+
+Output:
+Return valid JSON that matches this schema:
+{{"sections": [string], "applies_to_all": boolean}}
+
+SECTIONS:
+{sections}
+
+FEEDBACK:
+{state.human_feedback}
+"""
+
+
+def _drafts_reusable(state: BRDState) -> bool:
+    return bool(state.section_drafts) and len(state.section_drafts) == len(state.outline.ordered_sections)
+
+
+def _tagged_targets(state: BRDState) -> Dict[str, str]:
+    if not _drafts_reusable(state):
+        return {}
+    return parse_tagged_feedback(state.human_feedback or "", state.outline.ordered_sections)
+
+
+def _apply_routing(
+    state: BRDState,
+    targeted: Dict[str, str],
+    raw: Optional[str],
+    usage: Optional[dict],
+) -> BRDState:
+    routing: Optional[FeedbackRouting] = None
+    if raw is not None and raw.strip():
+        try:
+            routing = parse_json_model(raw, FeedbackRouting)
+        except ValueError as exc:
+            # The BRD already exists; a bad routing reply only costs targeting, so regenerate everything.
+            print(f"[warn] apply_feedback routing reply unusable ({exc}); regenerating all sections")
+    if routing is not None:
+        if not routing.applies_to_all:
+            for name in routing.sections:
+                section = _match_section(name, state.outline.ordered_sections)
+                if section is not None:
+                    targeted[section] = state.human_feedback or ""
+    state.section_feedback = targeted
+    if targeted:
+        print(f"[node] apply_feedback rewriting {len(targeted)} section(s): {', '.join(targeted)}")
+    else:
+        # Untargeted or structural feedback: rebuild the outline and every section.
+        state.section_drafts = []
+    tokens = usage["total_tokens"] if usage else 0
+    print(f"[node] apply_feedback tokens_used={tokens}")
+    debug_state("apply_feedback", state)
+    return state
+
+
 def apply_feedback_node(state: BRDState) -> BRDState:
     print("[node] apply_feedback")
     if not state.human_feedback:
         print("[node] apply_feedback tokens_used=0")
         debug_state("apply_feedback", state)
         return state
-    state.section_drafts = []
-    print("[node] apply_feedback tokens_used=0")
-    debug_state("apply_feedback", state)
-    return state
+    targeted = _tagged_targets(state)
+    raw = usage = None
+    if not targeted and _drafts_reusable(state):
+        raw, usage = generate_json_with_retry(_routing_prompt(state), 300, "apply_feedback")
+    return _apply_routing(state, targeted, raw, usage)
+
+
+async def aapply_feedback_node(state: BRDState) -> BRDState:
+    print("[node] apply_feedback")
+    if not state.human_feedback:
+        print("[node] apply_feedback tokens_used=0")
+        debug_state("apply_feedback", state)
+        return state
+    targeted = _tagged_targets(state)
+    raw = usage = None
+    if not targeted and _drafts_reusable(state):
+        raw, usage = await agenerate_json_with_retry(_routing_prompt(state), 300, "apply_feedback")
+    return _apply_routing(state, targeted, raw, usage)
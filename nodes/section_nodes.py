@@ -1,23 +1,41 @@
 from __future__ import annotations
 
-import json
-from typing import List
+import asyncio
+from typing import Callable, List, Optional
 
+from ..chunking import strip_locator_markers
 from ..debug import debug_state, format_sources
-from ..llm_utils import generate_text_with_usage
-from ..models import BRDState
+from ..llm_utils import (
+    agenerate_text_with_usage,
+    astream_text,
+    generate_text_with_usage,
+    stream_text,
+    thread_map,
+)
+from ..models import BRDState, GapReport
+from ..prompt_encoding import FACTS_FORMAT, prompt_facts, prompt_gaps
+from ..retrieval import SectionContextIndex
+from ..tokens import count_tokens, fit_texts, prompt_budget
+from .shared import DraftStream, stream_summary
 
 
-def section_writer_node(state: BRDState) -> BRDState:
-    print("[node] section_writer")
-    inputs_text = format_sources(state.source_texts)
-    drafts: List[str] = []
-    total_tokens = 0
-    total_prompt = 0
-    total_completion = 0
-    for section_name in state.outline.ordered_sections:
-        gap_slice = state.gaps.for_section(section_name).model_dump()
-        prompt = f"""SYSTEM
+def _revision_block(feedback: Optional[str], previous_draft: Optional[str]) -> str:
+    if not feedback:
+        return ""
+    block = f"\nREVISION:\n- Reviewer feedback to address: {feedback}\n"
+    if previous_draft:
+        block += f"- Previous draft to revise:\n{previous_draft}\n"
+    return block
+
+
+def _section_prompt(
+    section_name: str,
+    facts_json: str,
+    gaps_json: str,
+    inputs_text: str,
+    revision: str = "",
+) -> str:
+    return f"""SYSTEM
 You write ONE BRD section. Use only extracted facts and (if allowed) assumptions.
 
 USER
@@ -30,19 +48,166 @@ Output:
 Return the section as clean markdown text (no JSON).
 
 CONTEXT:
-- Facts (FactPack): {json.dumps(state.facts.model_dump(), indent=2)}
-- Gaps for this section (GapReport slice): {json.dumps(gap_slice, indent=2)}
+- Facts ({FACTS_FORMAT}): {facts_json}
+- Gaps for this section (GapReport slice): {gaps_json}
 - User inputs (for quoting): {inputs_text}
-"""
-        draft, usage = generate_text_with_usage(prompt, max_tokens=1400)
+{revision}"""
+
+
+_SECTION_MAX_TOKENS = 1400
+
+
+def _write_section(state: BRDState, section_name: str, prompt: str, echo: bool) -> tuple[str, dict]:
+    if not state.stream:
+        return generate_text_with_usage(prompt, max_tokens=_SECTION_MAX_TOKENS)
+    with DraftStream(state.stream_dir, section_name, echo=echo) as sink:
+        draft, usage = stream_text(prompt, max_tokens=_SECTION_MAX_TOKENS, on_delta=sink)
+    print(stream_summary(f"section_writer[{section_name}]", usage))
+    return draft, usage
+
+
+async def _awrite_section(
+    state: BRDState,
+    section_name: str,
+    prompt: str,
+    echo: bool,
+    limit: asyncio.Semaphore,
+) -> tuple[str, dict]:
+    async with limit:
+        if not state.stream:
+            return await agenerate_text_with_usage(prompt, max_tokens=_SECTION_MAX_TOKENS)
+        with DraftStream(state.stream_dir, section_name, echo=echo) as sink:
+            draft, usage = await astream_text(prompt, max_tokens=_SECTION_MAX_TOKENS, on_delta=sink)
+    print(stream_summary(f"section_writer[{section_name}]", usage))
+    return draft, usage
+
+
+def _announce_stream(state: BRDState, count: int, echo: bool) -> None:
+    if state.stream and not echo and state.stream_dir:
+        print(f"[stream] writing {count} section draft(s) to {state.stream_dir} as they arrive")
+
+
+def _sections_to_write(state: BRDState) -> List[int]:
+    sections = state.outline.ordered_sections
+    if state.section_feedback and len(state.section_drafts) == len(sections):
+        # Targeted feedback: only the named sections are regenerated; other drafts are reused.
+        return [i for i, name in enumerate(sections) if name in state.section_feedback]
+    return list(range(len(sections)))
+
+
+def _retrieval_query(section_name: str, gaps: GapReport, feedback: Optional[str]) -> str:
+    parts = [section_name]
+    for gap in gaps.blocking + gaps.non_blocking:
+        parts += [gap.field, gap.suggested_evidence_to_provide, gap.light_assumption_template or ""]
+    if feedback:
+        parts.append(feedback)
+    return " ".join(parts)
+
+
+def _section_prompts(state: BRDState, indices: List[int]) -> List[str]:
+    index: Optional[SectionContextIndex] = None
+    if state.retrieval_top_k > 0:
+        # One index per node run; each section then carries only its top-k facts and passages.
+        index = SectionContextIndex(state.source_texts, state.brownfield_texts, state.facts, state.chunk_size)
+    else:
+        # Encoded once here and shared by every section prompt.
+        facts_json = prompt_facts(state.facts)
+        plain_sources = [strip_locator_markers(t) for t in state.source_texts]
+    prompts = []
+    for i in indices:
+        section_name = state.outline.ordered_sections[i]
+        gap_slice = state.gaps.for_section(section_name)
+        gaps_json = prompt_gaps(gap_slice)
+        feedback = state.section_feedback.get(section_name) or state.human_feedback
+        previous = state.section_drafts[i] if section_name in state.section_feedback else None
+        revision = _revision_block(feedback, previous)
+        if index is not None:
+            facts, inputs_text = index.context_for(
+                _retrieval_query(section_name, gap_slice, feedback),
+                top_k=state.retrieval_top_k,
+                token_budget=state.section_context_tokens,
+            )
+            facts_json = prompt_facts(facts)
+        else:
+            # Without retrieval every input is pasted, so the sources share whatever the prompt leaves.
+            fixed = count_tokens(_section_prompt(section_name, facts_json, gaps_json, "", revision))
+            inputs_text = format_sources(
+                [t for t in fit_texts(plain_sources, prompt_budget(_SECTION_MAX_TOKENS) - fixed) if t]
+            )
+        prompts.append(
+            _section_prompt(
+                section_name,
+                facts_json,
+                gaps_json,
+                inputs_text,
+                revision,
+            )
+        )
+    return prompts
+
+
+def _apply_drafts(
+    state: BRDState,
+    indices: List[int],
+    results: List[tuple[str, dict]],
+    workers: int,
+) -> BRDState:
+    sections = state.outline.ordered_sections
+    drafts = list(state.section_drafts) if len(state.section_drafts) == len(sections) else [""] * len(sections)
+    total_tokens = 0
+    total_prompt = 0
+    total_completion = 0
+    for i, (draft, usage) in zip(indices, results):
         total_tokens += usage["total_tokens"]
         total_prompt += usage["prompt_tokens"]
         total_completion += usage["completion_tokens"]
-        drafts.append(draft.strip())
+        drafts[i] = draft.strip()
     state.section_drafts = drafts
+    state.section_feedback = {}
     print(
         f"[node] section_writer tokens_used={total_tokens} "
-        f"(prompt={total_prompt} completion={total_completion})"
+        f"(prompt={total_prompt} completion={total_completion}) "
+        f"written={len(indices)}/{len(sections)} workers={workers}"
     )
     debug_state("section_writer", state)
     return state
+
+
+def section_writer_node(state: BRDState, should_start: Optional[Callable[[], bool]] = None) -> BRDState:
+    print("[node] section_writer")
+    indices = _sections_to_write(state)
+    prompts = _section_prompts(state, indices)
+    workers = max(1, min(state.max_concurrency, len(prompts)))
+    names = [state.outline.ordered_sections[i] for i in indices]
+    # Deltas are echoed to the console only when sections are written one at a time.
+    echo = workers == 1
+    _announce_stream(state, len(prompts), echo)
+
+    def _job(job: tuple[str, str]) -> Optional[tuple[str, dict]]:
+        # should_start is checked as each section is picked up, so a caller can stop the rest (speculation).
+        if should_start is not None and not should_start():
+            return None
+        return _write_section(state, job[0], job[1], echo)
+
+    # thread_map returns results in submission order, so each draft lands at its outline index.
+    results = thread_map(_job, list(zip(names, prompts)), workers)
+    written = [(i, result) for i, result in zip(indices, results) if result is not None]
+    return _apply_drafts(state, [i for i, _ in written], [result for _, result in written], workers)
+
+
+async def asection_writer_node(state: BRDState) -> BRDState:
+    print("[node] section_writer")
+    indices = _sections_to_write(state)
+    prompts = _section_prompts(state, indices)
+    workers = max(1, min(state.max_concurrency, len(prompts)))
+    limit = asyncio.Semaphore(workers)
+    names = [state.outline.ordered_sections[i] for i in indices]
+    echo = workers == 1
+    _announce_stream(state, len(prompts), echo)
+    # gather preserves argument order, so each draft lands at its outline index.
+    results = list(
+        await asyncio.gather(
+            *(_awrite_section(state, name, prompt, echo, limit) for name, prompt in zip(names, prompts))
+        )
+    )
+    return _apply_drafts(state, indices, results, workers)
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
-from typing import Dict
+import re
+from pathlib import Path
+from typing import Dict, Optional, TextIO
 
 from ..models import (
     BRDModel,
     BRDOutline,
+    BRDState,
+    BRDTemplateSpec,
     Evidence,
     Fact,
     FactPack,
@@ -13,6 +17,7 @@ from ..models import (
     IntakeSummary,
     TemplateSectionSpec,
 )
+from ..template import load_template_spec
 
 
 def allowed_models() -> Dict[str, object]:
@@ -27,3 +32,44 @@ def allowed_models() -> Dict[str, object]:
         "Fact": Fact,
         "TemplateSectionSpec": TemplateSectionSpec,
     }
+
+
+def template_spec_for(state: BRDState) -> BRDTemplateSpec:
+    if state.template_spec is None:
+        state.template_spec = load_template_spec(Path(state.template_path))
+    return state.template_spec
+
+
+class DraftStream:
+    """Writes streamed deltas to <stream_dir>/<name>.md (and optionally the console) as they arrive."""
+
+    def __init__(self, stream_dir: Optional[str], name: str, echo: bool = False) -> None:
+        self.path = Path(stream_dir) / f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', name).strip('_')}.md" if stream_dir else None
+        self.echo = echo
+        self._handle: Optional[TextIO] = None
+
+    def __enter__(self) -> "DraftStream":
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = self.path.open("w", encoding="utf-8")
+        return self
+
+    def __call__(self, delta: str) -> None:
+        if self._handle is not None:
+            self._handle.write(delta)
+            self._handle.flush()
+        if self.echo:
+            print(delta, end="", flush=True)
+
+    def __exit__(self, *exc_info) -> None:
+        if self._handle is not None:
+            self._handle.close()
+        if self.echo:
+            print()
+
+
+def stream_summary(label: str, usage: dict) -> str:
+    return (
+        f"[stream] {label} ttft={usage.get('ttft_seconds', 0.0):.2f}s "
+        f"tokens_per_second={usage.get('tokens_per_second', 0.0)}"
+    )
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import sys
+import threading
+from contextvars import ContextVar, copy_context
+from typing import Any, List, Optional
+
+from ..llm_utils import UsageTotals, track_usage
+from ..metrics import instrumented, record_discarded_tokens
+from ..models import BRDState
+from .outline_nodes import outline_builder_node
+from .section_nodes import section_writer_node
+
+
+# Console output of speculative work is held back while the reviewer is answering the gap prompt.
+_HELD_OUTPUT: ContextVar[Optional[List[str]]] = ContextVar("brd_speculation_output", default=None)
+_CONSOLE_LOCK = threading.Lock()
+_CONSOLE_USERS = 0
+
+
+class _HoldingStdout:
+    # Writes from a context with a hold buffer (the speculation thread and its section workers) are kept;
+    # everything else, including the input() prompt, goes straight to the real stdout.
+    def __init__(self, target: Any) -> None:
+        self.target = target
+
+    def write(self, text: str) -> int:
+        held = _HELD_OUTPUT.get()
+        if held is None:
+            return self.target.write(text)
+        held.append(text)
+        return len(text)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.target, name)
+
+
+def _hold_console() -> None:
+    global _CONSOLE_USERS
+    with _CONSOLE_LOCK:
+        if _CONSOLE_USERS == 0:
+            sys.stdout = _HoldingStdout(sys.stdout)
+        _CONSOLE_USERS += 1
+
+
+def _release_console() -> None:
+    global _CONSOLE_USERS
+    with _CONSOLE_LOCK:
+        _CONSOLE_USERS -= 1
+        if _CONSOLE_USERS == 0 and isinstance(sys.stdout, _HoldingStdout):
+            sys.stdout = sys.stdout.target
+
+
+class Speculation:
+    """Runs outline_builder and section_writer on a copy of the state while a human reviews the gaps."""
+
+    def __init__(self, state: BRDState) -> None:
+        self._state = state.model_copy(deep=True)
+        # Nothing is echoed to the console while the reviewer is typing.
+        self._state.stream = False
+        self._result: Optional[BRDState] = None
+        self._usage: Optional[UsageTotals] = None
+        self._error: Optional[BaseException] = None
+        self._stopped: Optional[str] = None
+        self._output: List[str] = []
+        self._cancel = threading.Event()
+        # Run in a copy of the node's context so usage, metrics and the token budget all see these calls.
+        self._thread = threading.Thread(
+            target=copy_context().run, args=(self._run,), name="brd-speculation", daemon=True
+        )
+
+    def start(self) -> "Speculation":
+        print("[speculate] writing outline and sections while gap review is pending")
+        _hold_console()
+        self._thread.start()
+        return self
+
+    def _join(self) -> None:
+        self._thread.join()
+        _release_console()
+
+    def _may_start(self) -> bool:
+        # gap_human_review is not budgeted, so the token budget is checked here before every speculative call.
+        budget = self._state.token_budget
+        spent = self._state.tokens_used + (self._usage.billed_tokens if self._usage is not None else 0)
+        if self._cancel.is_set():
+            self._stopped = self._stopped or "cancelled"
+        elif budget is not None and spent >= budget:
+            self._stopped = self._stopped or f"token budget exhausted: used {spent} of {budget}"
+        return self._stopped is None
+
+    def _work(self, state: BRDState) -> Optional[BRDState]:
+        if not self._may_start():
+            return None
+        state = outline_builder_node(state)
+        # Sections not yet started are skipped once cancelled or out of budget, so discard returns promptly.
+        state = section_writer_node(state, should_start=self._may_start)
+        return None if self._stopped else state
+
+    def _run(self) -> None:
+        _HELD_OUTPUT.set(self._output)
+        with track_usage() as usage:
+            self._usage = usage
+            try:
+                self._result = instrumented("speculation", self._work)(self._state)
+            except Exception as exc:
+                self._error = exc
+
+    def adopt(self, state: BRDState) -> bool:
+        # Waits for the background run; on failure the normal outline/section path takes over.
+        self._join()
+        # The held node output is shown now that it belongs to the run.
+        print("".join(self._output), end="")
+        result = self._result
+        complete = result is not None and len(result.section_drafts) == len(result.outline.ordered_sections)
+        if self._error is not None or not complete:
+            print(f"[speculate] not usable ({self._error or self._stopped or 'incomplete'}); generating normally")
+            return False
+        state.outline = result.outline
+        state.section_drafts = result.section_drafts
+        state.section_feedback = {}
+        print(f"[speculate] adopted outline and {len(result.section_drafts)} section draft(s)")
+        return True
+
+    def discard(self) -> None:
+        # Calls already in flight finish and are counted as wasted; nothing new is started.
+        self._cancel.set()
+        self._join()
+        wasted = self._usage.billed_tokens if self._usage is not None else 0
+        record_discarded_tokens(wasted)
+        print(f"[speculate] discarded speculative outline/sections tokens_wasted={wasted}")
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .metrics import record_encoding_savings
+from .models import BRDTemplateSpec, FactPack, GapReport
+from .tokens import count_tokens, fit_facts
+
+# Shown next to every encoded FactPack so the model can resolve evidence ids.
+FACTS_FORMAT = (
+    'compact FactPack: {"facts": {category: [[statement, [evidence ids]]]}, '
+    '"evidence": {id: [source_name, locator, quote]}}; empty categories are omitted'
+)
+
+_CACHE_SIZE = 64
+# Keyed by object identity; each entry keeps its model alive, so an id cannot be reused while cached.
+_CACHE: "OrderedDict[Tuple[str, int, Optional[int]], Tuple[BaseModel, str, int]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _pruned(value: Any) -> Any:
+    # Drops None, empty strings and empty containers at every level.
+    if isinstance(value, dict):
+        pruned = {k: _pruned(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if v not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [_pruned(v) for v in value]
+    return value
+
+
+def encode_facts(facts: FactPack) -> str:
+    # Each distinct (source_name, locator, quote) is listed once; facts refer to it by id.
+    evidence_ids: Dict[Tuple[str, str, str], str] = {}
+    encoded: Dict[str, List[Any]] = {}
+    for category in FactPack.model_fields:
+        items = []
+        for fact in getattr(facts, category):
+            ids = []
+            for ev in fact.evidence:
+                key = (ev.source_name, ev.locator, ev.quote)
+                ids.append(evidence_ids.setdefault(key, f"E{len(evidence_ids) + 1}"))
+            items.append([fact.statement, ids])
+        if items:
+            encoded[category] = items
+    evidence = {ev_id: list(key) for key, ev_id in evidence_ids.items()}
+    return _dumps({"facts": encoded, "evidence": evidence})
+
+
+def encode_gaps(gaps: GapReport) -> str:
+    return _dumps(_pruned(gaps.model_dump()))
+
+
+def encode_template(spec: BRDTemplateSpec) -> str:
+    return _dumps(_pruned(spec.model_dump()))
+
+
+def _cached(
+    kind: str,
+    model: BaseModel,
+    budget: Optional[int],
+    encode: Callable[[], Tuple[str, BaseModel]],
+) -> str:
+    # Nodes replace FactPack/GapReport/template spec objects rather than mutating them, so an object is one
+    # state version: every node (and every section) that sees it reuses the encoding without re-serializing.
+    key = (kind, id(model), budget)
+    with _CACHE_LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+    if hit is None:
+        text, sent = encode()
+        saved = count_tokens(json.dumps(sent.model_dump(), indent=2)) - count_tokens(text)
+        hit = (model, text, saved)
+        with _CACHE_LOCK:
+            _CACHE[key] = hit
+            while len(_CACHE) > _CACHE_SIZE:
+                _CACHE.popitem(last=False)
+    record_encoding_savings(hit[2])
+    return hit[1]
+
+
+def prompt_facts(facts: FactPack, budget: Optional[int] = None) -> str:
+    def _encode() -> Tuple[str, BaseModel]:
+        fitted = facts if budget is None else fit_facts(facts, budget)
+        return encode_facts(fitted), fitted
+
+    return _cached("facts", facts, budget, _encode)
+
+
+def prompt_gaps(gaps: GapReport) -> str:
+    return _cached("gaps", gaps, None, lambda: (encode_gaps(gaps), gaps))
+
+
+def prompt_template(spec: BRDTemplateSpec) -> str:
+    return _cached("template", spec, None, lambda: (encode_template(spec), spec))
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from .chunking import SourceChunk, iter_chunks
+from .llm_utils import estimate_tokens
+from .models import Fact, FactPack
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._lengths: List[int] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_id, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            self._lengths.append(sum(counts.values()))
+            for term, freq in counts.items():
+                self._postings.setdefault(term, []).append((doc_id, freq))
+        count = len(self._lengths)
+        self._avg_length = (sum(self._lengths) / count) if count else 1.0
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def search(self, query: str, top_k: int) -> List[int]:
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, freq in self._postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / (self._avg_length or 1.0))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [doc_id for doc_id, _ in best]
+
+
+class SectionContextIndex:
+    def __init__(
+        self,
+        source_texts: Sequence[str],
+        brownfield_texts: Sequence[str],
+        facts: FactPack,
+        chunk_size: int,
+    ) -> None:
+        self.passages: List[SourceChunk] = list(iter_chunks(source_texts, chunk_size))
+        self.passages += list(iter_chunks(brownfield_texts, chunk_size, label="brownfield"))
+        self.facts: List[Tuple[str, Fact]] = [
+            (category, fact) for category in FactPack.model_fields for fact in getattr(facts, category)
+        ]
+        self._passage_index = BM25Index([p.text for p in self.passages])
+        self._fact_index = BM25Index(
+            [f"{category.replace('_', ' ')} {fact.statement}" for category, fact in self.facts]
+        )
+
+    def context_for(self, query: str, top_k: int, token_budget: int) -> Tuple[FactPack, str]:
+        # Facts are denser than raw passages, so they get the first half of the budget.
+        fact_budget = token_budget // 2
+        selected: Dict[str, List[Fact]] = {}
+        used = 0
+        for idx in self._fact_index.search(query, top_k * 2):
+            category, fact = self.facts[idx]
+            cost = estimate_tokens(fact.model_dump_json())
+            if used + cost > fact_budget:
+                break
+            selected.setdefault(category, []).append(fact)
+            used += cost
+
+        parts: List[str] = []
+        for idx in self._passage_index.search(query, top_k):
+            rendered = self.passages[idx].render()
+            cost = estimate_tokens(rendered)
+            if used + cost > token_budget:
+                break
+            parts.append(rendered)
+            used += cost
+        return FactPack(**selected), "\n\n".join(parts)
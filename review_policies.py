@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+import queue
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .models import BRDState, GapItem
+
+# Gap entries carry "generate"/"inputs"; review entries carry "approve"/"feedback".
+# The "file" policies read the same entries from {"gap": [...], "review": [...]}.
+_DECISION_QUEUE: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+
+
+class BlockingGapsError(RuntimeError):
+    def __init__(self, gaps: List[GapItem]) -> None:
+        self.gaps = gaps
+        super().__init__("Blocking gaps found: " + ", ".join(f"{g.section}/{g.field}" for g in gaps))
+
+
+@dataclass
+class GapDecision:
+    generate: bool
+    extra_inputs: List[str] = field(default_factory=list)
+
+
+@dataclass
+class ReviewDecision:
+    approve: bool
+    feedback: Optional[str] = None
+
+
+def decision_queue() -> "queue.Queue[Dict[str, Any]]":
+    return _DECISION_QUEUE
+
+
+def _load_decisions(state: BRDState, stage: str) -> List[Dict[str, Any]]:
+    if not state.decisions_path:
+        raise ValueError(f"The 'file' {stage} policy requires decisions_path.")
+    data = json.loads(Path(state.decisions_path).read_text(encoding="utf-8"))
+    return list(data.get(stage, []))
+
+
+def _gap_interactive(state: BRDState) -> GapDecision:
+    choice = input("Generate anyway? (y/n): ").strip().lower()
+    if choice in {"y", "yes"}:
+        return GapDecision(generate=True)
+    more = input("Provide additional input paths (comma-separated) or leave empty to stop: ").strip()
+    return GapDecision(generate=False, extra_inputs=[p.strip() for p in more.split(",") if p.strip()])
+
+
+def _gap_force_generate(state: BRDState) -> GapDecision:
+    return GapDecision(generate=True)
+
+
+def _gap_fail_on_blocking(state: BRDState) -> GapDecision:
+    if state.gaps.blocking:
+        raise BlockingGapsError(list(state.gaps.blocking))
+    return GapDecision(generate=True)
+
+
+def _gap_from_entry(entry: Dict[str, Any]) -> GapDecision:
+    return GapDecision(generate=bool(entry.get("generate")), extra_inputs=list(entry.get("inputs", [])))
+
+
+def _gap_file(state: BRDState) -> GapDecision:
+    decisions = _load_decisions(state, "gap")
+    if state.gap_rounds >= len(decisions):
+        print("[warn] gap decisions exhausted; generating anyway")
+        return GapDecision(generate=True)
+    return _gap_from_entry(decisions[state.gap_rounds])
+
+
+def _gap_queue(state: BRDState) -> GapDecision:
+    return _gap_from_entry(_DECISION_QUEUE.get())
+
+
+def _review_interactive(state: BRDState) -> ReviewDecision:
+    print("\n--- GENERATED BRD ---\n")
+    print(state.brd_markdown)
+    choice = input("Approve BRD? (y/n): ").strip().lower()
+    if choice in {"y", "yes"}:
+        return ReviewDecision(approve=True)
+    return ReviewDecision(approve=False, feedback=input("Provide feedback or corrections: ").strip())
+
+
+def _review_auto_approve(state: BRDState) -> ReviewDecision:
+    return ReviewDecision(approve=True)
+
+
+def _review_from_entry(entry: Dict[str, Any]) -> ReviewDecision:
+    return ReviewDecision(approve=bool(entry.get("approve")), feedback=entry.get("feedback"))
+
+
+def _review_file(state: BRDState) -> ReviewDecision:
+    decisions = _load_decisions(state, "review")
+    if state.review_rounds >= len(decisions):
+        print("[warn] review decisions exhausted; approving")
+        return ReviewDecision(approve=True)
+    return _review_from_entry(decisions[state.review_rounds])
+
+
+def _review_queue(state: BRDState) -> ReviewDecision:
+    return _review_from_entry(_DECISION_QUEUE.get())
+
+
+_GAP_HANDLERS: Dict[str, Callable[[BRDState], GapDecision]] = {
+    "interactive": _gap_interactive,
+    "force-generate": _gap_force_generate,
+    "fail-on-blocking": _gap_fail_on_blocking,
+    "file": _gap_file,
+    "queue": _gap_queue,
+}
+
+_REVIEW_HANDLERS: Dict[str, Callable[[BRDState], ReviewDecision]] = {
+    "interactive": _review_interactive,
+    "auto-approve": _review_auto_approve,
+    "file": _review_file,
+    "queue": _review_queue,
+}
+
+GAP_POLICIES = tuple(_GAP_HANDLERS)
+# Policies whose decision can take a while (a person answers), so speculative generation can overlap it.
+WAITING_GAP_POLICIES = ("interactive", "queue")
+REVIEW_POLICIES = tuple(_REVIEW_HANDLERS)
+
+
+def decide_gaps(state: BRDState) -> GapDecision:
+    try:
+        handler = _GAP_HANDLERS[state.gap_policy]
+    except KeyError as exc:
+        raise ValueError(f"Unknown gap policy: {state.gap_policy}") from exc
+    return handler(state)
+
+
+def decide_review(state: BRDState) -> ReviewDecision:
+    try:
+        handler = _REVIEW_HANDLERS[state.review_policy]
+    except KeyError as exc:
+        raise ValueError(f"Unknown review policy: {state.review_policy}") from exc
+    return handler(state)
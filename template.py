@@ -1,13 +1,29 @@
 from __future__ import annotations
 
+import json
 import re
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
 from pypdf import PdfReader
 
 from .models import BRDTemplateSpec, TemplateSectionSpec
 
+SPEC_SIDECAR_SUFFIX = ".spec.json"
+_SPEC_FORMAT_VERSION = 1
+
+# Used when the template PDF has no dotted table of contents.
+FALLBACK_SECTION_NAMES = (
+    "Technology Platform and Tools",
+    "Initiating a Workflow",
+    "User Roles/Responsibilities",
+    "Workflow 1: SensoryUX Workflow",
+    "Workflow 2: Analytical Workflow",
+    "Out of Scope",
+    "Appendix and Supporting Documents",
+)
+
 
 def extract_template_sections(template_path: Path) -> List[TemplateSectionSpec]:
     reader = PdfReader(str(template_path))
@@ -26,17 +42,69 @@ def extract_template_sections(template_path: Path) -> List[TemplateSectionSpec]:
                 sections.append(TemplateSectionSpec(name=title, required_fields=["content"]))
 
     if not sections:
-        sections = [
-            TemplateSectionSpec(name="Technology Platform and Tools", required_fields=["content"]),
-            TemplateSectionSpec(name="Initiating a Workflow", required_fields=["content"]),
-            TemplateSectionSpec(name="User Roles/Responsibilities", required_fields=["content"]),
-            TemplateSectionSpec(name="Workflow 1: SensoryUX Workflow", required_fields=["content"]),
-            TemplateSectionSpec(name="Workflow 2: Analytical Workflow", required_fields=["content"]),
-            TemplateSectionSpec(name="Out of Scope", required_fields=["content"]),
-            TemplateSectionSpec(name="Appendix and Supporting Documents", required_fields=["content"]),
-        ]
+        sections = [TemplateSectionSpec(name=name, required_fields=["content"]) for name in FALLBACK_SECTION_NAMES]
     return sections
 
 
 def build_template_spec(template_path: Path) -> BRDTemplateSpec:
     return BRDTemplateSpec(sections=extract_template_sections(template_path))
+
+
+def sidecar_path(template_path: Path) -> Path:
+    return template_path.with_name(template_path.name + SPEC_SIDECAR_SUFFIX)
+
+
+def _read_sidecar(path: Path, size: int, mtime_ns: int) -> Optional[BRDTemplateSpec]:
+    try:
+        payload = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    source = payload.get("source", {})
+    if (
+        payload.get("version") != _SPEC_FORMAT_VERSION
+        or source.get("size") != size
+        or source.get("mtime_ns") != mtime_ns
+    ):
+        return None
+    try:
+        return BRDTemplateSpec(**payload["spec"])
+    except Exception:
+        return None
+
+
+def write_template_sidecar(template_path: Path, spec: BRDTemplateSpec) -> Path:
+    stat = template_path.stat()
+    payload = {
+        "version": _SPEC_FORMAT_VERSION,
+        "source": {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        "spec": spec.model_dump(),
+    }
+    path = sidecar_path(template_path)
+    path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    return path
+
+
+@lru_cache(maxsize=16)
+def _load_template_spec(resolved: str, size: int, mtime_ns: int) -> BRDTemplateSpec:
+    template_path = Path(resolved)
+    if template_path.suffix.lower() == ".json":
+        # A precompiled spec: either a sidecar payload or a bare BRDTemplateSpec.
+        payload = json.loads(template_path.read_text(encoding="utf-8"))
+        return BRDTemplateSpec(**payload.get("spec", payload))
+
+    spec = _read_sidecar(sidecar_path(template_path), size, mtime_ns)
+    if spec is not None:
+        return spec
+    spec = build_template_spec(template_path)
+    try:
+        write_template_sidecar(template_path, spec)
+    except OSError as exc:
+        print(f"[warn] could not write template spec sidecar: {exc}")
+    return spec
+
+
+def load_template_spec(template_path: Path) -> BRDTemplateSpec:
+    resolved = template_path.resolve()
+    stat = resolved.stat()
+    spec = _load_template_spec(str(resolved), stat.st_size, stat.st_mtime_ns)
+    return spec.model_copy(deep=True)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence
+
+from .models import FactPack
+
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+_ENCODING_NAME = "o200k_base"
+_CONTEXT_TOKENS = 128000
+# Headroom for chat-format overhead the local count cannot see (role markers, tool framing).
+_SAFETY_MARGIN = 256
+_TRUNCATION_MARK = "\n[... truncated to fit the prompt budget ...]"
+
+
+class PromptTooLargeError(ValueError):
+    pass
+
+
+def configure_tokenizer(context_tokens: int = 128000, encoding: Optional[str] = None) -> None:
+    global _CONTEXT_TOKENS, _ENCODING_NAME
+    _CONTEXT_TOKENS = max(1, context_tokens)
+    if encoding:
+        _ENCODING_NAME = encoding
+
+
+@lru_cache(maxsize=4)
+def _load_encoder(name: str) -> Any:
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as exc:
+        # get_encoding downloads the BPE file on first use; offline hosts fall back to the estimate.
+        print(f"[warn] tokenizer {name!r} unavailable ({type(exc).__name__}); estimating tokens from length")
+        return None
+
+
+def _encoder() -> Any:
+    return _load_encoder(_ENCODING_NAME)
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoder = _encoder()
+    if encoder is None:
+        return max(1, len(text) // 4)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, limit: int) -> str:
+    if count_tokens(text) <= limit:
+        return text
+    keep = max(0, limit - count_tokens(_TRUNCATION_MARK))
+    encoder = _encoder()
+    if encoder is None:
+        return text[:keep * 4] + _TRUNCATION_MARK
+    return encoder.decode(encoder.encode(text, disallowed_special=())[:keep]) + _TRUNCATION_MARK
+
+
+def prompt_budget(max_tokens: int) -> int:
+    return max(0, _CONTEXT_TOKENS - max_tokens - _SAFETY_MARGIN)
+
+
+def check_prompt(prompt: str, max_tokens: int) -> int:
+    prompt_tokens = count_tokens(prompt)
+    if prompt_tokens > prompt_budget(max_tokens):
+        raise PromptTooLargeError(
+            f"Prompt is {prompt_tokens} tokens; the {_CONTEXT_TOKENS}-token context leaves "
+            f"{prompt_budget(max_tokens)} after reserving {max_tokens} for the completion."
+        )
+    return prompt_tokens
+
+
+def fit_texts(texts: Sequence[str], budget: int) -> List[str]:
+    # Water-filling: small texts stay whole and the remaining budget is shared evenly by the larger ones.
+    costs = [count_tokens(text) for text in texts]
+    # Token counts are not additive across joins, so each text reserves a little for its separator.
+    budget -= 2 * len(texts) + 2
+    if sum(costs) <= budget:
+        return list(texts)
+    allowance: Dict[int, int] = {}
+    remaining = max(0, budget)
+    order = sorted(range(len(texts)), key=lambda i: costs[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        allowance[i] = min(costs[i], share)
+        remaining -= allowance[i]
+    # The result stays aligned with the input; a text with no allowance left comes back empty.
+    return [
+        text if allowance[i] >= costs[i] else (truncate_to_tokens(text, allowance[i]) if allowance[i] else "")
+        for i, text in enumerate(texts)
+    ]
+
+
+def fit_facts(facts: FactPack, budget: int) -> FactPack:
+    # Sizes are measured on minified JSON, an upper bound for the compact prompt encoding.
+    if count_tokens(facts.model_dump_json()) <= budget:
+        return facts
+    # First drop extra evidence, then keep facts round-robin across categories until the budget is spent.
+    slim = {
+        category: [fact.model_copy(update={"evidence": fact.evidence[:1]}) for fact in getattr(facts, category)]
+        for category in FactPack.model_fields
+    }
+    kept: Dict[str, list] = {category: [] for category in slim}
+    used = count_tokens(FactPack().model_dump_json())
+    depth = 0
+    while any(depth < len(items) for items in slim.values()):
+        for category, items in slim.items():
+            if depth >= len(items):
+                continue
+            cost = count_tokens(items[depth].model_dump_json())
+            if used + cost > budget:
+                return FactPack(**kept)
+            kept[category].append(items[depth])
+            used += cost
+        depth += 1
+    return FactPack(**kept)